@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Time the hamster-briefs report engines against a synthetic hamster.db.
+
+    python3 benchmarks/bench_engines.py --years 5 -r weekly -r gross
+
+Prints the best wall time of each --engine, its speedup over 'sql',
+and whether its output matched the 'sql' output.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hamster_briefs import brief_engine
+from hamster_briefs.hamster_briefs import Hamsterer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth_hamster_db
+
+def run_briefs(argv):
+	stdout = io.StringIO()
+	sys_argv = sys.argv
+	sys.argv = ['hamster-briefs',] + argv
+	try:
+		with contextlib.redirect_stdout(stdout):
+			time_0 = time.perf_counter()
+			Hamsterer().go()
+			elapsed = time.perf_counter() - time_0
+	finally:
+		sys.argv = sys_argv
+	return (elapsed, stdout.getvalue())
+
+def bench_engine(db_path, engine, report_args, repeat):
+	argv = [
+		'-D', db_path,
+		'-b', '1970-01-01',
+		'-e', '2100-01-01',
+		'--engine', engine,
+	] + report_args
+	best = None
+	output = None
+	for n_run in range(repeat):
+		(elapsed, output) = run_briefs(argv)
+		best = elapsed if best is None else min(best, elapsed)
+	return (best, output)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+	parser.add_argument('--years', type=int, default=5)
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--db', dest='db_path', type=str, default=None,
+		help="Benchmark an existing hamster.db instead of a synthetic one",
+	)
+	parser.add_argument('-r', dest='report_types', action='append', default=[])
+	args = parser.parse_args()
+
+	report_types = args.report_types or ['weekly', 'gross', 'daily',]
+	report_args = []
+	for report_type in report_types:
+		report_args += ['-r', report_type,]
+
+	engines = ['sql', 'union', 'scan',]
+	if brief_engine.load_numpy() is not None:
+		engines.append('numpy')
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		db_path = args.db_path
+		if db_path is None:
+			db_path = os.path.join(tmp_dir, 'hamster.db')
+			n_facts = synth_hamster_db.make_hamster_db(db_path, years=args.years)
+			print('Synthesized %d facts (%d years)' % (n_facts, args.years,))
+		print('Reports: %s' % (' '.join(report_types),))
+		sql_secs = None
+		sql_output = None
+		for engine in engines:
+			(secs, output) = bench_engine(db_path, engine, report_args, args.repeat)
+			if engine == 'sql':
+				(sql_secs, sql_output) = (secs, output)
+			print('%-6s %8.3f secs  %5.1fx  %s' % (
+				engine,
+				secs,
+				sql_secs / secs,
+				'same output' if output == sql_output else 'OUTPUT DIFFERS',
+			))
+
+if (__name__ == '__main__'):
+	main()
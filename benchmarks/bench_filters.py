@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Time -c (category) reports with and without the filter pushed down.
+
+    python3 benchmarks/bench_filters.py --years 5 -c client-x
+
+Prints, for each date range, how many facts reach the tag join (and the
+group_concat and dedupe) with the -c filter applied in the inner fact
+subquery ('pushed') and only after the dedupe ('after'), the best wall
+time of each, and whether their output matched.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hamster_briefs.hamster_briefs import Hamsterer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth_hamster_db
+
+DATE_RANGES = [
+	('all', '1970-01-01', '2100-01-01',),
+	('1 year', '2017-01-01', '2018-01-01',),
+	('1 month', '2017-06-01', '2017-07-01',),
+]
+
+def run_briefs(argv, pushed):
+	stdout = io.StringIO()
+	sys_argv = sys.argv
+	sys.argv = ['hamster-briefs',] + argv
+	setup_pushed = Hamsterer.setup_sql_category_start_times
+	if not pushed:
+		# The old SQL: no -c filter until after the dedupe.
+		def setup_after(self):
+			self.str_params['SQL_CATEGORY_START_TIMES'] = ''
+		Hamsterer.setup_sql_category_start_times = setup_after
+	try:
+		with contextlib.redirect_stdout(stdout):
+			time_0 = time.perf_counter()
+			Hamsterer().go()
+			elapsed = time.perf_counter() - time_0
+	finally:
+		sys.argv = sys_argv
+		Hamsterer.setup_sql_category_start_times = setup_pushed
+	return (elapsed, stdout.getvalue())
+
+def count_inner_facts(db_path, categories, time_beg, time_end):
+	"""Return how many facts reach the tag join, after and pushed."""
+	conn = sqlite3.connect(db_path)
+	try:
+		sql_range = """
+			FROM facts
+			WHERE NOT facts.deleted
+				AND facts.start_time >= ? AND facts.start_time < ?
+		"""
+		(n_after,) = conn.execute(
+			"SELECT count(*) %s" % (sql_range,), (time_beg, time_end,)
+		).fetchone()
+		(n_pushed,) = conn.execute(
+			"""
+			SELECT count(*) %s
+				AND facts.start_time IN (
+					SELECT facts.start_time
+					FROM facts
+					JOIN activities ON (activities.id = facts.activity_id)
+					JOIN categories ON (categories.id = activities.category_id)
+					WHERE NOT facts.deleted
+						AND categories.name IN (%s)
+				)
+			""" % (sql_range, ', '.join(['?'] * len(categories)),),
+			[time_beg, time_end,] + categories
+		).fetchone()
+	finally:
+		conn.close()
+	return (n_after, n_pushed)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+	parser.add_argument('--years', type=int, default=5)
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--db', dest='db_path', type=str, default=None,
+		help="Benchmark an existing hamster.db instead of a synthetic one",
+	)
+	parser.add_argument('-c', dest='categories', action='append', default=[])
+	parser.add_argument('-r', dest='report_types', action='append', default=[])
+	args = parser.parse_args()
+
+	categories = args.categories or ['client-x',]
+	report_types = args.report_types or ['gross', 'weekly',]
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		db_path = args.db_path
+		if db_path is None:
+			db_path = os.path.join(tmp_dir, 'hamster.db')
+			n_facts = synth_hamster_db.make_hamster_db(db_path, years=args.years)
+			print('Synthesized %d facts (%d years)' % (n_facts, args.years,))
+		print('Categories: %s / Reports: %s' % (
+			' '.join(categories), ' '.join(report_types),
+		))
+		for (range_name, time_beg, time_end) in DATE_RANGES:
+			argv = ['-D', db_path, '-b', time_beg, '-e', time_end,]
+			for category in categories:
+				argv += ['-c', category,]
+			for report_type in report_types:
+				argv += ['-r', report_type,]
+			(n_after, n_pushed) = count_inner_facts(
+				db_path, categories, time_beg, time_end,
+			)
+			results = {}
+			for pushed in (False, True,):
+				results[pushed] = min([
+					run_briefs(argv, pushed) for n_run in range(args.repeat)
+				])
+			print('%-8s after %7d facts %8.3f secs / pushed %7d facts %8.3f secs  %s' % (
+				range_name,
+				n_after,
+				results[False][0],
+				n_pushed,
+				results[True][0],
+				'same output' if results[False][1] == results[True][1] else 'OUTPUT DIFFERS',
+			))
+
+if (__name__ == '__main__'):
+	main()
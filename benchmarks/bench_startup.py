@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Time how quickly hamster-briefs starts, and fail if it's too slow.
+
+    python3 benchmarks/bench_startup.py --check
+
+Prints the cumulative `python -X importtime` of hamster_briefs.hamster_briefs
+(and its slowest imports), and the best wall time from launch to the first
+byte of output of `hamster-briefs -0` and `-1` against a synthetic hamster.db.
+With --check, exits nonzero if either exceeds its target (for CI).
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth_hamster_db
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The targets --check enforces. The import time excludes the interpreter's
+# own startup; the first output time includes it.
+TARGET_IMPORT_MSECS = 60.0
+TARGET_FIRST_OUTPUT_MSECS = 150.0
+
+RE_IMPORTTIME = re.compile(r'^import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)$')
+
+def child_env():
+	env = dict(os.environ)
+	env['PYTHONPATH'] = os.pathsep.join(
+		[REPO_DIR,] + [x for x in (env.get('PYTHONPATH'),) if x]
+	)
+	return env
+
+def measure_imports(module='hamster_briefs.hamster_briefs'):
+	"""Return the module's cumulative import usecs., and each import's self usecs."""
+	ret = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', 'import %s' % (module,),],
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE,
+		env=child_env(),
+		check=True,
+	)
+	cumulative = None
+	self_usecs = []
+	for line in ret.stderr.decode('utf-8').split('\n'):
+		match = RE_IMPORTTIME.match(line)
+		if match is None:
+			continue
+		self_usecs.append((int(match.group(1)), match.group(4),))
+		if (match.group(4) == module) and (not match.group(3)):
+			cumulative = int(match.group(2))
+	return (cumulative, self_usecs)
+
+def measure_first_output(argv):
+	"""Return the secs. from launch to the first byte on stdout."""
+	time_0 = time.perf_counter()
+	proc = subprocess.Popen(
+		[sys.executable, '-m', 'hamster_briefs.hamster_briefs',] + argv,
+		stdout=subprocess.PIPE,
+		stderr=subprocess.DEVNULL,
+		env=child_env(),
+	)
+	proc.stdout.read(1)
+	elapsed = time.perf_counter() - time_0
+	proc.stdout.read()
+	proc.wait()
+	return elapsed
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+	parser.add_argument('--repeat', type=int, default=5)
+	parser.add_argument('--years', type=int, default=1)
+	parser.add_argument('--db', dest='db_path', type=str, default=None,
+		help="Run the reports on an existing hamster.db instead of a synthetic one",
+	)
+	parser.add_argument('--check', action='store_true', default=False,
+		help="Exit 1 if startup is slower than the targets",
+	)
+	parser.add_argument('--max-import-msecs', type=float, default=TARGET_IMPORT_MSECS)
+	parser.add_argument('--max-first-output-msecs', type=float,
+		default=TARGET_FIRST_OUTPUT_MSECS,
+	)
+	args = parser.parse_args()
+
+	too_slow = []
+
+	import_usecs = None
+	for n_run in range(args.repeat):
+		(cumulative, self_usecs) = measure_imports()
+		if (import_usecs is None) or (cumulative < import_usecs):
+			(import_usecs, slowest) = (cumulative, self_usecs)
+	print('import %-23s %7.1f msecs' % ('hamster_briefs', import_usecs / 1000.0,))
+	for (usecs, module) in sorted(slowest, reverse=True)[:8]:
+		print('  %-28s %7.1f msecs (self)' % (module, usecs / 1000.0,))
+	if import_usecs / 1000.0 > args.max_import_msecs:
+		too_slow.append('import')
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		db_path = args.db_path
+		if db_path is None:
+			db_path = os.path.join(tmp_dir, 'hamster.db')
+			synth_hamster_db.make_hamster_db(db_path, years=args.years, open_fact=True)
+		for report_arg in ('-0', '-1',):
+			best = min([
+				measure_first_output(['-D', db_path, report_arg,])
+				for n_run in range(args.repeat)
+			])
+			print('first output %-17s %7.1f msecs' % (report_arg, best * 1000.0,))
+			if best * 1000.0 > args.max_first_output_msecs:
+				too_slow.append(report_arg)
+
+	if args.check and too_slow:
+		print('Slower than target: %s' % (', '.join(too_slow),))
+		sys.exit(1)
+
+if (__name__ == '__main__'):
+	main()
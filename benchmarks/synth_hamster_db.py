@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Make a synthetic hamster.db for benchmarking hamster-briefs.
+
+    python3 benchmarks/synth_hamster_db.py /tmp/hamster-synth.db --years 5
+"""
+
+import argparse
+import datetime
+import random
+import sqlite3
+
+SCHEMA = """
+	CREATE TABLE categories (
+		id INTEGER PRIMARY KEY, name varchar2(500), search_name varchar2(500)
+	);
+	CREATE TABLE activities (
+		id INTEGER PRIMARY KEY, name varchar2(500), category_id INTEGER,
+		deleted INTEGER, search_name varchar2(500)
+	);
+	CREATE TABLE facts (
+		id INTEGER PRIMARY KEY, activity_id INTEGER,
+		start_time TIMESTAMP, end_time TIMESTAMP,
+		description varchar2, deleted INTEGER DEFAULT 0
+	);
+	CREATE TABLE tags (
+		id INTEGER PRIMARY KEY, name TEXT NOT NULL, autocomplete BOOL DEFAULT true
+	);
+	CREATE TABLE fact_tags (fact_id INTEGER, tag_id INTEGER);
+"""
+
+CATEGORIES = ['work', 'personal', 'client-x', 'client-y', 'admin',]
+
+TAGS = ['alpha', 'beta', 'gamma', 'delta', 'meeting', 'review', 'billable',]
+
+DESCRIPTIONS = [
+	None,
+	'Fixed the thing.',
+	'Reviewed PRs.\n\nLeft lots of comments.',
+	'Standup',
+	'Read docs and took notes on the weekly rollup',
+]
+
+def make_hamster_db(db_path, years=1, n_activities=40, seed=1, open_fact=False):
+	rand = random.Random(seed)
+	conn = sqlite3.connect(db_path)
+	curs = conn.cursor()
+	curs.executescript(SCHEMA)
+	for cat_id, name in enumerate(CATEGORIES, 1):
+		curs.execute(
+			"INSERT INTO categories VALUES (?, ?, ?)", (cat_id, name, name,)
+		)
+	for act_id in range(1, n_activities + 1):
+		name = 'Activity %d' % (act_id,)
+		curs.execute(
+			"INSERT INTO activities VALUES (?, ?, ?, 0, ?)",
+			(act_id, name, 1 + act_id % len(CATEGORIES), name.lower(),)
+		)
+	for tag_id, name in enumerate(TAGS, 1):
+		curs.execute("INSERT INTO tags VALUES (?, ?, 1)", (tag_id, name,))
+
+	fact_id = 0
+	fact_beg = None
+	day_0 = datetime.datetime(2018, 1, 1, 8, 0) - datetime.timedelta(365 * years)
+	for n_day in range(365 * years):
+		fact_beg = day_0 + datetime.timedelta(n_day)
+		for n_fact in range(rand.randint(0, 12)):
+			fact_end = fact_beg + datetime.timedelta(minutes=rand.randint(5, 120))
+			fact_id += 1
+			curs.execute(
+				"INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?)",
+				(
+					fact_id,
+					rand.randint(1, n_activities),
+					fact_beg.strftime('%Y-%m-%d %H:%M:%S'),
+					fact_end.strftime('%Y-%m-%d %H:%M:%S'),
+					rand.choice(DESCRIPTIONS),
+					1 if rand.random() < 0.01 else 0,
+				)
+			)
+			for tag_id in rand.sample(range(1, len(TAGS) + 1), rand.randint(0, 3)):
+				curs.execute(
+					"INSERT INTO fact_tags VALUES (?, ?)", (fact_id, tag_id,)
+				)
+			fact_beg = fact_end + datetime.timedelta(minutes=rand.randint(0, 30))
+	if open_fact and fact_beg:
+		# Like the activity hamster is currently tracking.
+		fact_id += 1
+		curs.execute(
+			"INSERT INTO facts VALUES (?, 1, ?, NULL, NULL, 0)",
+			(fact_id, fact_beg.strftime('%Y-%m-%d %H:%M:%S'),)
+		)
+	conn.commit()
+	conn.close()
+	return fact_id
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+	parser.add_argument('db_path', type=str)
+	parser.add_argument('--years', type=int, default=1)
+	parser.add_argument('--activities', type=int, default=40)
+	parser.add_argument('--seed', type=int, default=1)
+	parser.add_argument('--open-fact', action='store_true', default=False,
+		help="End with an open fact (whose duration grows until now)",
+	)
+	args = parser.parse_args()
+	n_facts = make_hamster_db(
+		args.db_path,
+		years=args.years,
+		n_activities=args.activities,
+		seed=args.seed,
+		open_fact=args.open_fact,
+	)
+	print('Wrote %d facts to %s' % (n_facts, args.db_path,))
+
+if (__name__ == '__main__'):
+	main()
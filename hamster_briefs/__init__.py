@@ -1,5 +1,4 @@
 import os
-import subprocess
 import sys
 
 # FIXME: Can-should we reference this value and get rid of version_hamster?
@@ -7,6 +6,8 @@ SCRIPT_VERS = '0.10.0'
 
 def run_hamster_love():
     """Bash shim"""
+    # Imported here, so importing hamster_briefs stays quick.
+    import subprocess
     # This feels so dirty it feels so right.
     hamster_briefs_path = os.path.dirname(__file__)
     abspath = os.path.join(hamster_briefs_path, 'hamster_love.sh')
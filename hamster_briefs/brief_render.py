@@ -0,0 +1,135 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Render typed report rows as the pipe tables the reports print.
+
+The report queries (run in-process) and the Brief_Engine hand over plain
+values -- the summed seconds, and the category and activity names -- and
+a Brief_Renderer formats each row into the columns its header promises.
+The columns are fixed widths, not measured off the rows, so each row
+prints as soon as it arrives (see Hamsterer.output_print_lines).
+
+(The sqlite3 executable prints what it selects, so for --sqlite3
+coprocess and subprocess, Hamsterer.SQL_DURATION et al. still format in
+SQL; the format_* fcns. here print the same.)
+"""
+
+# *** Values.
+
+def format_value(value):
+	# Mimic `sqlite3 -list`: NULL is the empty string, and REALs
+	# print like sqlite3's "%!.15g", which always keeps a decimal.
+	if isinstance(value, str):
+		return value
+	if value is None:
+		return ''
+	if isinstance(value, float):
+		formatted = '%.15g' % (value,)
+		if formatted.lstrip('-').isdigit():
+			formatted += '.0'
+		elif ('e' in formatted) and ('.' not in formatted):
+			formatted = formatted.replace('e', '.0e', 1)
+		return formatted
+	if isinstance(value, bytes):
+		return value.decode('utf-8', 'replace')
+	return str(value)
+
+def format_duration(duration):
+	# Same as Hamsterer.SQL_DURATION: seconds, shown as hours.
+	# NOTE: Not '%.3f' % (duration / 3600.0): the float of, e.g., 27
+	#       seconds is a hair under 0.0075 hours, which '%.3f' rounds
+	#       down. Round the thousandths of an hour in integers (which are
+	#       exact), half up, as Hamsterer.SQL_HOURS does.
+	seconds = duration or 0
+	millihours = int((abs(seconds) * 1000 + 1800) // 3600)
+	hours = '%s%d.%03d' % (
+		'-' if seconds < 0 else '', millihours // 1000, millihours % 1000,
+	)
+	return hours.rjust(8)[-8:]
+
+def format_category(category_name):
+	# Same as Hamsterer.SQL_CATEGORY_FMTS.
+	if category_name is None:
+		return ''
+	return ('            ' + category_name)[-12:]
+
+def format_activity(activity_name):
+	# Same as Hamsterer.SQL_ACTIVITY_FMTS. (Note that substr(x, 0, 54)
+	# is 53 characters long.)
+	if activity_name is None:
+		return ''
+	return (activity_name + ' ' * 54)[:53]
+
+# *** Columns.
+
+class Brief_Column(object):
+
+	__slots__ = ('name', 'width', 'format_value', 'in_header',)
+
+	def __init__(self, name, width=None, format_value=format_value, in_header=True):
+		self.name = name
+		self.width = width or len(name)
+		self.format_value = format_value
+		self.in_header = in_header
+
+WEEKDAY_COLUMN = Brief_Column('wkd')
+START_DATE_COLUMN = Brief_Column('start_date')
+WEEK_NUM_COLUMN = Brief_Column('wk')
+DURATION_COLUMN = Brief_Column('duration', format_value=format_duration)
+CATEGORY_COLUMN = Brief_Column('category_nom', format_value=format_category)
+ACTIVITY_COLUMN = Brief_Column('activity_nom', width=53, format_value=format_activity)
+TAG_NAMES_COLUMN = Brief_Column('tag_names')
+# The -T tag names, which the headers have never shown.
+SHOW_TAGS_COLUMN = Brief_Column('tag_names', in_header=False)
+
+class Brief_Renderer(object):
+
+	def __init__(self, columns):
+		self.columns = columns
+		self.formatters = [column.format_value for column in columns]
+
+	def header_lines(self):
+		columns = [column for column in self.columns if column.in_header]
+		return [
+			'|'.join([column.name.ljust(column.width) for column in columns]),
+			'|'.join(['-' * column.width for column in columns]),
+		]
+
+	def format_row(self, row):
+		# Any columns past ours (e.g., a UNION's NULL padding) are ignored.
+		return '|'.join([
+			format_value(value) for (format_value, value) in zip(self.formatters, row)
+		])
+
+	def output_lines(self, rows):
+		for row in rows:
+			# A tag name or comment might span lines (see
+			# Hamsterer.output_reassemble_split_line_comments).
+			for outln in self.format_row(row).split('\n'):
+				yield outln
+
+def report_renderer(
+	use_week_num=False,
+	use_categories=False,
+	group_by_activities=False,
+	group_by_facts_tags=False,
+	show_tags=False,
+):
+	"""Return the Brief_Renderer for a daily, weekly, or gross report's
+	rows, which are (day_of_week, start_date[, week_num], duration
+	[, category_name][, activity_name][, tag_names]).
+	"""
+	columns = [WEEKDAY_COLUMN, START_DATE_COLUMN]
+	if use_week_num:
+		columns.append(WEEK_NUM_COLUMN)
+	columns.append(DURATION_COLUMN)
+	if use_categories:
+		columns.append(CATEGORY_COLUMN)
+	if group_by_activities:
+		columns.append(ACTIVITY_COLUMN)
+	if group_by_facts_tags:
+		columns.append(TAG_NAMES_COLUMN)
+	elif show_tags:
+		columns.append(SHOW_TAGS_COLUMN)
+	return Brief_Renderer(columns)
@@ -0,0 +1,96 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Ask a running `hamster-briefs --serve` for a report.
+
+    hamster-briefs-client -1 -r gross
+
+takes the same options as hamster-briefs, and prints the same output.
+If no server's listening, it runs the report itself, the slow way.
+
+This only imports the standard library, so it starts quickly.
+"""
+
+import json
+import os
+import socket
+import sys
+
+def default_socket_path():
+	socket_path = os.environ.get('HAMSTER_BRIEFS_SOCKET')
+	if socket_path:
+		return socket_path
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+	if runtime_dir:
+		return os.path.join(runtime_dir, 'hamster-briefs.sock')
+	return '/tmp/hamster-briefs-%d.sock' % (os.getuid(),)
+
+# One message each way: the JSON, then EOF.
+
+def send_message(sock, message):
+	sock.sendall(json.dumps(message).encode('utf-8'))
+	sock.shutdown(socket.SHUT_WR)
+
+def recv_message(sock):
+	chunks = []
+	while True:
+		chunk = sock.recv(65536)
+		if not chunk:
+			break
+		chunks.append(chunk)
+	return json.loads(b''.join(chunks).decode('utf-8'))
+
+def request(argv, socket_path=None, cwd=None, argv0='hamster-briefs'):
+	"""Return the server's {'exit': int, 'stdout': str, 'stderr': str}."""
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(socket_path or default_socket_path())
+		send_message(sock, {
+			'argv': list(argv),
+			'argv0': argv0,
+			'cwd': cwd or os.getcwd(),
+		})
+		return recv_message(sock)
+	finally:
+		sock.close()
+
+def server_alive(socket_path):
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(socket_path)
+	except OSError:
+		return False
+	finally:
+		sock.close()
+	return True
+
+def argv_socket_path(argv):
+	# The --socket the server was told to use (see Hamsterer's options),
+	# if given. The argv still goes to the server (or the fallback) as is,
+	# which accepts the option, too.
+	socket_path = None
+	for (idx, arg) in enumerate(argv):
+		if arg == '--':
+			break
+		if (arg == '--socket') and (idx + 1 < len(argv)):
+			socket_path = argv[idx + 1]
+		elif arg.startswith('--socket='):
+			socket_path = arg[len('--socket='):]
+	return socket_path
+
+def main():
+	argv = sys.argv[1:]
+	try:
+		response = request(argv, socket_path=argv_socket_path(argv), argv0=sys.argv[0])
+	except (OSError, ValueError):
+		# No server (or it went away): do it ourselves.
+		from hamster_briefs.hamster_briefs import main as briefs_main
+		briefs_main()
+		return
+	sys.stderr.write(response['stderr'])
+	sys.stdout.write(response['stdout'])
+	sys.exit(response['exit'])
+
+if (__name__ == '__main__'):
+	main()
@@ -0,0 +1,152 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""`hamster-briefs --serve`: answer report requests over a Unix socket.
+
+Python, the option parser, and the database connection are already up,
+SQLite's page cache and prepared statements stay warm between requests,
+and report output is kept in memory until hamster.db changes. Use
+briefs_client (hamster-briefs-client) to ask for reports.
+
+Requests are handled one at a time, in the server's process, so each
+can chdir to the client's working directory and capture stdout.
+"""
+
+import contextlib
+import io
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import traceback
+import urllib.parse
+
+from hamster_briefs import briefs_client
+from hamster_briefs import result_cache
+
+log = logging.getLogger('hamster-briefs')
+
+class Briefs_Server_Error(Exception):
+	pass
+
+# Not an Exception, so a request in progress doesn't catch it.
+class Briefs_Server_Stop(BaseException):
+	pass
+
+def raise_server_stop(signum, frame):
+	raise Briefs_Server_Stop()
+
+class Briefs_Server(object):
+
+	def __init__(self, script_class, socket_path=None):
+		# The Hamsterer class (which imports us).
+		self.script_class = script_class
+		self.socket_path = socket_path or briefs_client.default_socket_path()
+		self.conns = {}
+		self.result_cache = result_cache.Memory_Result_Cache()
+		self.n_requests = 0
+
+	def connection(self, db_path):
+		"""Return the (read-only) connection to db_path, kept between requests."""
+		db_path = os.path.realpath(db_path)
+		conn = self.conns.get(db_path)
+		if conn is None:
+			conn = sqlite3.connect(
+				'file:%s?mode=ro' % (urllib.parse.quote(db_path),),
+				uri=True,
+				cached_statements=256,
+			)
+			self.conns[db_path] = conn
+		return conn
+
+	def listen(self):
+		if os.path.exists(self.socket_path):
+			if briefs_client.server_alive(self.socket_path):
+				raise Briefs_Server_Error(
+					'Already serving on %s' % (self.socket_path,)
+				)
+			# Left over from a server that didn't clean up.
+			os.unlink(self.socket_path)
+		listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		# Only this user may connect.
+		umask = os.umask(0o077)
+		try:
+			listener.bind(self.socket_path)
+		finally:
+			os.umask(umask)
+		listener.listen(16)
+		return listener
+
+	def serve_forever(self):
+		listener = self.listen()
+		print('Serving reports on %s' % (self.socket_path,), flush=True)
+		signal.signal(signal.SIGTERM, raise_server_stop)
+		try:
+			while True:
+				(client, _addr) = listener.accept()
+				with client:
+					self.handle(client)
+		except (KeyboardInterrupt, Briefs_Server_Stop):
+			pass
+		finally:
+			listener.close()
+			try:
+				os.unlink(self.socket_path)
+			except OSError:
+				pass
+			for conn in self.conns.values():
+				conn.close()
+			self.conns = {}
+
+	def handle(self, client):
+		try:
+			request = briefs_client.recv_message(client)
+			response = self.run(
+				request['argv'],
+				cwd=request.get('cwd'),
+				argv0=request.get('argv0', 'hamster-briefs'),
+			)
+			briefs_client.send_message(client, response)
+		except (OSError, ValueError, KeyError) as err:
+			# E.g., the client hung up, or sent us garbage.
+			log.warning('Bad request: %s' % (str(err),))
+
+	def run(self, argv, cwd=None, argv0='hamster-briefs'):
+		"""Run hamster-briefs with argv; return its exit code, stdout, and stderr."""
+		self.n_requests += 1
+		stdout = io.StringIO()
+		stderr = io.StringIO()
+		# Also send our log messages to the client.
+		log_handler = logging.StreamHandler(stderr)
+		log_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+		exit_code = 0
+		sys_argv = sys.argv
+		sys.argv = [argv0,] + list(argv)
+		orig_cwd = os.getcwd()
+		log.addHandler(log_handler)
+		try:
+			with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+				if cwd:
+					os.chdir(cwd)
+				self.script_class(briefs_server=self).go()
+		except SystemExit as err:
+			if isinstance(err.code, int):
+				exit_code = err.code
+			elif err.code is not None:
+				stderr.write('%s\n' % (err.code,))
+				exit_code = 1
+		except Exception:
+			stderr.write(traceback.format_exc())
+			exit_code = 1
+		finally:
+			log.removeHandler(log_handler)
+			sys.argv = sys_argv
+			os.chdir(orig_cwd)
+		return {
+			'exit': exit_code,
+			'stdout': stdout.getvalue(),
+			'stderr': stderr.getvalue(),
+		}
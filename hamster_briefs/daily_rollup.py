@@ -0,0 +1,200 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""A sidecar database of daily totals, so reports needn't re-add old facts.
+
+Next to hamster.db, we keep hamster.db-briefs-rollup, with one row per
+day x activity x tag set: the total duration, and the earliest start
+time (which is all the daily, weekly, and gross reports need from
+each fact).
+
+Closed days are rolled up once: everything before today, and before
+the open fact (whose duration grows until it's stopped). On each run,
+we re-roll the days of any new facts (facts.id > the last max id), and
+roll up any days that have since closed. If facts were deleted (fewer
+facts than expected), or marked deleted (or undeleted, i.e., fewer or
+more of the old facts are NOT deleted), we roll up everything again.
+
+CAVEAT: Editing an old fact in place (i.e., without deleting it and
+adding it anew, like hamster does), or changing its tags, isn't noticed.
+Use --rollup-rebuild after such an edit.
+"""
+
+# Bump this to rebuild everyone's rollups after changing the schema (or
+# how the fact durations are counted).
+ROLLUP_VERSION = 3
+
+ROLLUP_SCHEMA = [
+	"""
+	CREATE TABLE IF NOT EXISTS %(schema)s.rollup_meta (
+		key TEXT PRIMARY KEY,
+		value
+	)
+	""",
+	"""
+	CREATE TABLE IF NOT EXISTS %(schema)s.daily_rollup (
+		day TEXT NOT NULL,
+		start_time TEXT NOT NULL,
+		activity_id INTEGER,
+		tag_names TEXT,
+		duration INTEGER,
+		n_facts INTEGER
+	)
+	""",
+	"""
+	CREATE INDEX IF NOT EXISTS %(schema)s.daily_rollup_day
+		ON daily_rollup (day)
+	""",
+]
+
+def rollup_path_for(db_path):
+	return '%s-briefs-rollup' % (db_path,)
+
+class Daily_Rollup(object):
+
+	def __init__(self, conn, rollup_path, schema='rollup'):
+		self.conn = conn
+		self.rollup_path = rollup_path
+		self.schema = schema
+		self.built_until = None
+		self.n_roll_ups = 0
+
+	def attach(self):
+		self.conn.execute(
+			"ATTACH DATABASE ? AS %s" % (self.schema,), (self.rollup_path,)
+		)
+		for sql_create in ROLLUP_SCHEMA:
+			self.conn.execute(sql_create % {'schema': self.schema,})
+
+	def detach(self):
+		self.conn.execute("DETACH DATABASE %s" % (self.schema,))
+
+	def meta_get(self, key, default=None):
+		row = self.conn.execute(
+			"SELECT value FROM %s.rollup_meta WHERE key = ?" % (self.schema,),
+			(key,)
+		).fetchone()
+		return row[0] if row else default
+
+	def meta_set(self, key, value):
+		self.conn.execute(
+			"INSERT OR REPLACE INTO %s.rollup_meta (key, value) VALUES (?, ?)"
+			% (self.schema,),
+			(key, value,)
+		)
+
+	def clear(self):
+		self.conn.execute("DELETE FROM %s.daily_rollup" % (self.schema,))
+		self.built_until = None
+
+	def roll_up(self, sql_fact_durations, day_beg, day_end):
+		"""Add the days in [day_beg, day_end) to the rollup.
+
+		sql_fact_durations is the (unfiltered) fact durations SELECT,
+		with its start_time bounds left as two '?'s: beg, end.
+		"""
+		self.conn.execute(
+			"""
+			INSERT INTO %s.daily_rollup
+				(day, start_time, activity_id, tag_names, duration, n_facts)
+			SELECT
+				date(start_time) AS day
+				, min(start_time)
+				, activity_id
+				, tag_names
+				, sum(duration)
+				, count(*)
+			FROM (%s) AS fact_durations
+			GROUP BY day, activity_id, tag_names
+			""" % (self.schema, sql_fact_durations,),
+			(day_beg or '0000-01-01', day_end,)
+		)
+
+	def sync(self, sql_fact_durations, rebuild=False):
+		"""Bring the rollup up to date; returns the first day not rolled up."""
+		(max_id, n_facts) = self.conn.execute(
+			"SELECT IFNULL(max(id), 0), count(*) FROM facts"
+		).fetchone()
+		# Roll up the days before today, and before the open fact.
+		(cutoff,) = self.conn.execute(
+			"""
+			SELECT min(
+				date('now', 'localtime'),
+				IFNULL((
+					SELECT min(date(start_time)) FROM facts
+					WHERE end_time IS NULL AND NOT deleted
+				), '9999-12-31')
+			)
+			"""
+		).fetchone()
+
+		last_max_id = 0
+		last_n_facts = 0
+		last_n_live_facts = None
+		self.built_until = None
+		if (not rebuild) and (self.meta_get('version') == ROLLUP_VERSION):
+			last_max_id = self.meta_get('max_fact_id', 0)
+			last_n_facts = self.meta_get('n_facts', 0)
+			last_n_live_facts = self.meta_get('n_live_facts')
+			self.built_until = self.meta_get('built_until')
+		(n_new,) = self.conn.execute(
+			"SELECT count(*) FROM facts WHERE id > ?", (last_max_id,)
+		).fetchone()
+		# The facts we rolled up that are still NOT deleted (the reports'
+		# filter), which changes when hamster marks (or unmarks) one.
+		(n_live_facts,) = self.conn.execute(
+			"SELECT count(*) FROM facts WHERE id <= ? AND NOT deleted",
+			(last_max_id,)
+		).fetchone()
+		if (
+			(n_facts != last_n_facts + n_new)
+			or (n_live_facts != last_n_live_facts)
+		):
+			# Facts were deleted (or hamster.db was replaced): start over.
+			last_max_id = 0
+			self.built_until = None
+		if self.built_until is None:
+			self.clear()
+
+		if (self.built_until is not None) and (cutoff < self.built_until):
+			# E.g., someone started a fact yesterday that's still going.
+			self.conn.execute(
+				"DELETE FROM %s.daily_rollup WHERE day >= ?" % (self.schema,),
+				(cutoff,)
+			)
+			self.built_until = cutoff
+
+		if self.built_until is not None:
+			dirty_days = [row[0] for row in self.conn.execute(
+				"""
+				SELECT DISTINCT date(start_time) FROM facts
+				WHERE id > ? AND date(start_time) < ?
+				""",
+				(last_max_id, self.built_until,)
+			).fetchall()]
+			for day in dirty_days:
+				self.conn.execute(
+					"DELETE FROM %s.daily_rollup WHERE day = ?" % (self.schema,),
+					(day,)
+				)
+				(day_end,) = self.conn.execute(
+					"SELECT date(?, '+1 day')", (day,)
+				).fetchone()
+				self.roll_up(sql_fact_durations, day, day_end)
+				self.n_roll_ups += 1
+
+		if (self.built_until is None) or (self.built_until < cutoff):
+			self.roll_up(sql_fact_durations, self.built_until, cutoff)
+			self.n_roll_ups += 1
+			self.built_until = cutoff
+
+		self.meta_set('version', ROLLUP_VERSION)
+		self.meta_set('max_fact_id', max_id)
+		self.meta_set('n_facts', n_facts)
+		self.meta_set('n_live_facts', self.conn.execute(
+			"SELECT count(*) FROM facts WHERE id <= ? AND NOT deleted", (max_id,)
+		).fetchone()[0])
+		self.meta_set('built_until', self.built_until)
+		self.conn.commit()
+		return self.built_until
@@ -0,0 +1,197 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""A full-text index of facts, for --query and --description.
+
+Next to hamster.db, we keep hamster.db-briefs-search, an SQLite FTS5
+table with one row per fact (its rowid is the fact's id): the fact's
+description, and its activity, category, and tag names.
+
+Like the daily rollup, on each run we index the new facts (facts.id >
+the last max id). If facts were deleted, or an activity, category, or
+tag was renamed, we index everything again. (hamster edits a fact by
+deleting it and adding it anew, so edits are new facts.)
+"""
+
+import hashlib
+import os
+import sqlite3
+import urllib.parse
+
+# Bump this to rebuild everyone's indexes after changing the schema.
+SEARCH_VERSION = 1
+
+SEARCH_SCHEMA = [
+	"""
+	CREATE TABLE IF NOT EXISTS search_meta (
+		key TEXT PRIMARY KEY,
+		value
+	)
+	""",
+	# Index 2- and 3-letter prefixes, so 'meet*' is as quick as 'meeting'.
+	"""
+	CREATE VIRTUAL TABLE IF NOT EXISTS fact_search USING fts5(
+		description,
+		activity_name,
+		category_name,
+		tag_names,
+		tokenize = 'unicode61 remove_diacritics 2',
+		prefix = '2 3'
+	)
+	""",
+]
+
+def search_path_for(db_path):
+	return '%s-briefs-search' % (db_path,)
+
+def match_terms(text):
+	# Match each word, as a prefix, and all of them. Quoting each word
+	# keeps FTS5 from reading, e.g., 'foo-bar' or 'AND' as syntax.
+	return ' AND '.join([
+		'"%s"*' % (word.replace('"', '""'),) for word in text.split()
+	])
+
+def match_query(queries, descriptions):
+	"""Return the FTS5 MATCH for the --query and --description options.
+
+	Any --query (matching any column) and any --description (matching
+	just the description) will do, but it must match one of each.
+	"""
+	parts = []
+	query_terms = [match_terms(x) for x in (queries or []) if x.split()]
+	if query_terms:
+		parts.append(' OR '.join(['(%s)' % (x,) for x in query_terms]))
+	description_terms = [match_terms(x) for x in (descriptions or []) if x.split()]
+	if description_terms:
+		parts.append(' OR '.join(
+			['description : (%s)' % (x,) for x in description_terms]
+		))
+	return ' AND '.join(['(%s)' % (x,) for x in parts])
+
+class Fact_Search(object):
+
+	def __init__(self, search_path, schema='search'):
+		self.search_path = search_path
+		self.schema = schema
+		self.n_indexed = 0
+
+	def connect(self, db_path):
+		# Our own connection, so we can write the index even when the
+		# reports' connection is read-only (e.g., under --serve).
+		conn = sqlite3.connect(
+			'file:%s' % (urllib.parse.quote(self.search_path),), uri=True,
+		)
+		conn.execute(
+			"ATTACH DATABASE ? AS hamster",
+			('file:%s?mode=ro' % (urllib.parse.quote(os.path.realpath(db_path)),),)
+		)
+		for sql_create in SEARCH_SCHEMA:
+			conn.execute(sql_create)
+		return conn
+
+	@staticmethod
+	def meta_get(conn, key, default=None):
+		row = conn.execute(
+			"SELECT value FROM search_meta WHERE key = ?", (key,)
+		).fetchone()
+		return row[0] if row else default
+
+	@staticmethod
+	def names_token(conn):
+		# Changes whenever an activity, category, or tag is renamed.
+		names_hash = hashlib.sha1()
+		for table_name in ('activities', 'categories', 'tags',):
+			for (name_id, name) in conn.execute(
+				"SELECT id, name FROM hamster.%s ORDER BY id" % (table_name,)
+			):
+				names_hash.update(('%s|%s|%s\n' % (table_name, name_id, name,)).encode('utf-8'))
+		return names_hash.hexdigest()
+
+	def sync(self, db_path, rebuild=False):
+		"""Index the facts added since the last sync."""
+		conn = self.connect(db_path)
+		try:
+			(max_id, n_facts) = conn.execute(
+				"SELECT IFNULL(max(id), 0), count(*) FROM hamster.facts"
+			).fetchone()
+			names_token = Fact_Search.names_token(conn)
+			last_max_id = 0
+			if (
+				(not rebuild)
+				and (Fact_Search.meta_get(conn, 'version') == SEARCH_VERSION)
+				and (Fact_Search.meta_get(conn, 'names_token') == names_token)
+			):
+				last_max_id = Fact_Search.meta_get(conn, 'max_fact_id', 0)
+				last_n_facts = Fact_Search.meta_get(conn, 'n_facts', 0)
+				(n_new,) = conn.execute(
+					"SELECT count(*) FROM hamster.facts WHERE id > ?", (last_max_id,)
+				).fetchone()
+				if n_facts != last_n_facts + n_new:
+					# Facts were deleted (or hamster.db was replaced).
+					last_max_id = 0
+			if last_max_id == 0:
+				conn.execute("DELETE FROM fact_search")
+			if max_id > last_max_id:
+				cursor = conn.execute(
+					"""
+					INSERT INTO fact_search
+						(rowid, description, activity_name, category_name, tag_names)
+					SELECT
+						facts.id
+						, facts.description
+						, activities.name
+						, categories.name
+						, fact_tag_names.tag_names
+					FROM hamster.facts
+					LEFT OUTER JOIN hamster.activities
+						ON (activities.id = facts.activity_id)
+					LEFT OUTER JOIN hamster.categories
+						ON (categories.id = activities.category_id)
+					-- One pass over fact_tags (which needn't be indexed by fact).
+					LEFT OUTER JOIN (
+						SELECT
+							fact_tags.fact_id
+							, group_concat(tags.name, ' ') AS tag_names
+						FROM hamster.fact_tags
+						JOIN hamster.tags ON (tags.id = fact_tags.tag_id)
+						WHERE fact_tags.fact_id > ?
+						GROUP BY fact_tags.fact_id
+					) AS fact_tag_names ON (fact_tag_names.fact_id = facts.id)
+					WHERE facts.id > ?
+					""",
+					(last_max_id, last_max_id,)
+				)
+				self.n_indexed = cursor.rowcount
+			for (key, value) in (
+				('version', SEARCH_VERSION),
+				('max_fact_id', max_id),
+				('n_facts', n_facts),
+				('names_token', names_token),
+			):
+				conn.execute(
+					"INSERT OR REPLACE INTO search_meta (key, value) VALUES (?, ?)",
+					(key, value,)
+				)
+			conn.commit()
+		finally:
+			conn.close()
+
+	def attach(self, conn):
+		conn.execute(
+			"ATTACH DATABASE ? AS %s" % (self.schema,), (self.search_path,)
+		)
+
+	def detach(self, conn):
+		conn.execute("DETACH DATABASE %s" % (self.schema,))
+
+	def fact_ids(self, search_query):
+		"""Return the ids of the facts that match (for external sqlite3)."""
+		conn = sqlite3.connect(self.search_path)
+		try:
+			return [row[0] for row in conn.execute(
+				"SELECT rowid FROM fact_search WHERE fact_search MATCH ? ORDER BY rowid",
+				(search_query,)
+			)]
+		finally:
+			conn.close()
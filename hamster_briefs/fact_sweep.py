@@ -0,0 +1,43 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Find untracked gaps and overlapping facts (--gaps and --overlaps).
+
+One pass over the facts, ordered by start_time (which SQLite sorts, or
+reads in order from the --ensure-indexes start_time index): remember
+just the fact that ends the latest so far. A fact that starts after it
+ends leaves a gap; a fact that starts before it ends overlaps it.
+"""
+
+# Each fact row is (fact_id, start_time, end_time, start_jd, end_jd),
+# where the times are 'YYYY-MM-DD HH:MM:SS' and the jds are julianday()s.
+
+def sweep_facts(fact_rows, min_gap_days=0.0):
+	"""Yield ('gap', before_row, after_row, gap_days) and
+	('overlap' or 'duplicate', latest_row, fact_row, overlap_days).
+
+	Gaps shorter than min_gap_days, and gaps overnight (that is, from one
+	day to the next, i.e., when you were probably sleeping), are skipped.
+	"""
+	latest = None
+	for fact_row in fact_rows:
+		if latest is None:
+			latest = fact_row
+			continue
+		(fact_id, start_time, end_time, start_jd, end_jd) = fact_row
+		if start_jd > latest[4]:
+			gap_days = start_jd - latest[4]
+			if (
+				(gap_days >= min_gap_days)
+				and (latest[2][:10] == start_time[:10])
+			):
+				yield ('gap', latest, fact_row, gap_days)
+		elif start_jd < latest[4]:
+			if (start_time == latest[1]) and (end_time == latest[2]):
+				kind = 'duplicate'
+			else:
+				kind = 'overlap'
+			yield (kind, latest, fact_row, min(end_jd, latest[4]) - start_jd)
+		if end_jd >= latest[4]:
+			latest = fact_row
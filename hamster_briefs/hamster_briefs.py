@@ -17,21 +17,41 @@ import os
 import sys
 
 import datetime
+import io
 import re
 import sqlite3
-import subprocess
 import time
 
 import pyoiler_argparse
 
 import logging
-import pyoiler_logging
-#pyoiler_logging.init_logging(pyoiler_logging.DEBUG, log_to_console=True)
-#pyoiler_logging.init_logging(logging.DEBUG, log_to_stderr=True)
-pyoiler_logging.init_logging(logging.WARNING, log_to_stderr=True)
 log = logging.getLogger('hamster-briefs')
 
 import hamster_briefs.version_hamster
+from hamster_briefs import brief_engine
+from hamster_briefs import brief_render
+from hamster_briefs import result_cache
+from hamster_briefs import sqlite_caps
+
+# NOTE: To start quickly, we only import what the common reports use.
+#       The --serve, --jobs, --rollup, --query, --gaps/--overlaps, and
+#       --check-indexes (and --explain) modules, and subprocess and
+#       sqlite_coproc (for the external sqlite3 modes), are imported where
+#       they're used, like numpy (see brief_engine.load_numpy).
+#       See benchmarks/bench_startup.py.
+
+# Logging is set up once we know the level (see HR_Argparser.verify).
+pyoiler_logging = None
+
+def setup_logging(level_name):
+	global pyoiler_logging
+	if pyoiler_logging is None:
+		import pyoiler_logging as pyoiler_logging_module
+		pyoiler_logging = pyoiler_logging_module
+		#pyoiler_logging.init_logging(pyoiler_logging.DEBUG, log_to_console=True)
+		#pyoiler_logging.init_logging(logging.DEBUG, log_to_stderr=True)
+		pyoiler_logging.init_logging(logging.WARNING, log_to_stderr=True)
+	pyoiler_logging.setLevel(getattr(pyoiler_logging, level_name))
 
 SCRIPT_DESC = '''verb / 3rd person present: briefs / 1. instruct or inform (someone) thoroughly, especially in preparation for a task.'''
 
@@ -89,6 +109,8 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 		'gross-totals',
 		'report',
 		'report-activity',
+		'gaps',
+		'overlaps',
 	])
 
 	gross_report = [
@@ -179,6 +201,20 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 			help="Match activities AND tags names, else just OR",
 		)
 
+		self.add_argument('-q', '--query', '--search', dest='query',
+			action='append', type=str, metavar='QUERY',
+			help="Only facts whose description, activity, category, or tags "
+				"have all these words (or word prefixes)",
+		)
+		self.add_argument('--description', dest='description',
+			action='append', type=str, metavar='DESCRIPTION',
+			help="Like --query, but only search fact descriptions",
+		)
+		self.add_argument('--search-rebuild', dest='search_rebuild',
+			action='store_true', default=False,
+			help="Rebuild the --query search index from scratch",
+		)
+
 		self.add_argument('-0', '--today', dest='prev_week',
 			action='store_const', const=0,
 		)
@@ -241,10 +277,109 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 			help="Format as daily activity-tag aggregate with fact descriptions [and fact times]",
 		)
 
+		self.add_argument('-g', '--gaps', dest='check_gaps',
+			action='store_true', default=False,
+			help="List untracked time between facts (but not overnight)",
+		)
+		self.add_argument('--gap-minutes', dest='gap_minutes',
+			type=float, metavar='MINUTES', default=15.0,
+			help="Ignore --gaps shorter than this",
+		)
+		self.add_argument('--overlaps', dest='check_overlaps',
+			action='store_true', default=False,
+			help="List facts that overlap (or duplicate) other facts",
+		)
+
 		self.add_argument('-S', '--show-sql', dest='show_sql',
 			action='store_true', default=False,
 		)
 
+		self.add_argument('--rollup', dest='use_rollup',
+			action='store_true', default=False,
+			help="Read closed days from a daily rollup kept next to "
+				"HAMSTER_DB_PATH (made and updated as needed)",
+		)
+		self.add_argument('--rollup-rebuild', dest='rollup_rebuild',
+			action='store_true', default=False,
+			help="Rebuild the daily rollup (e.g., after editing old facts)",
+		)
+
+		self.add_argument('--follow', dest='follow',
+			action='store_true', default=False,
+			help="Keep running, and reprint the reports when facts change "
+				"(or the open fact's time grows)",
+		)
+		self.add_argument('--follow-interval', dest='follow_interval',
+			type=float, metavar='SECONDS', default=2.0,
+			help="How often --follow checks for changes",
+		)
+
+		self.add_argument('--serve', dest='serve',
+			action='store_true', default=False,
+			help="Answer hamster-briefs-client requests on a Unix socket",
+		)
+		self.add_argument('--socket', dest='socket_path',
+			type=str, metavar='SOCKET_PATH', default=None,
+			help="Where --serve listens, and hamster-briefs-client connects "
+				"[default: $HAMSTER_BRIEFS_SOCKET, "
+				"or $XDG_RUNTIME_DIR/hamster-briefs.sock]",
+		)
+
+		self.add_argument('--cache', dest='use_cache',
+			action='store_true', default=False,
+			help="Reuse the output of the same report run on the same hamster.db",
+		)
+		self.add_argument('--cache-dir', dest='cache_dir',
+			type=str, metavar='CACHE_DIR', default=None,
+			help="Where --cache keeps output [default: ~/.cache/hamster-briefs]",
+		)
+		self.add_argument('--cache-size', dest='cache_size',
+			type=int, metavar='MBYTES',
+			default=result_cache.DEFAULT_CACHE_BYTES // (1024 * 1024),
+			help="How much output --cache keeps, in MB (least recently used goes first)",
+		)
+
+		self.add_argument('--explain', dest='explain',
+			action='store_true', default=False,
+			help="Print each query's plan (marking scans, temp b-trees, "
+				"and correlated subqueries), and its row count and run time",
+		)
+
+		self.add_argument('--sqlite3', dest='sqlite3_mode',
+			type=str, metavar='SQLITE3_MODE',
+			choices=['auto', 'internal', 'coprocess', 'subprocess',], default='auto',
+			help="How to run report SQL: 'internal' uses Python's sqlite3; "
+				"'coprocess' feeds every query to one sqlite3 binary; "
+				"'subprocess' runs the sqlite3 binary once per query; "
+				"'auto' picks 'internal' unless Python's sqlite3 is too old",
+		)
+
+		self.add_argument('--engine', dest='report_engine',
+			type=str, metavar='ENGINE', choices=['sql', 'union', 'scan', 'numpy',], default='sql',
+			help="How to aggregate the daily, weekly, sprint and gross reports: "
+				"'sql' runs a query per report; "
+				"'union' runs each run of weekly, sprint and gross reports "
+				"as one UNION ALL query; "
+				"'scan' computes them all from a single pass over the facts; "
+				"'numpy' loads the facts into columns and uses numpy (if installed)",
+		)
+
+		self.add_argument('-j', '--jobs', dest='jobs',
+			type=int, metavar='N', default=1,
+			help="Run up to N reports at once, each in its own process "
+				"(0 for one per CPU)",
+		)
+
+		self.add_argument('--check-indexes', dest='check_indexes',
+			action='store_true', default=False,
+			help="Report which indexes the report queries want, and exit",
+		)
+		self.add_argument('--ensure-indexes', dest='ensure_indexes',
+			action='store_true', default=False,
+			help="Create the missing report indexes, ANALYZE, and exit "
+				"(modifies HAMSTER_DB_PATH)",
+		)
+
 		self.add_argument('-vv', '--verbose', dest='be_verbose',
 			action='store_true', default=False,
 		)
@@ -281,26 +416,11 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 
 	def prepare_add_stubs(self):
 
-		# LATER/#XXX: Check for gaps feature.
-		self.add_argument('-g', '--gaps', dest='check_gaps',
-			action='store_true', default=False,
-		)
-
 		# LATER/MAYBE/#XXX: day-starts feature. I.e., other than at midnight.
 		self.add_argument('-d', '--time-day-starts', dest='day_starts',
 			type=str, metavar='TIME_DAY_STARTS', default=None
 		)
 
-		# MAYBE/#XXX: Need a search-description option?
-		self.add_argument('--description', dest='description',
-			action='append', type=str, metavar='DESCRIPTION',
-		)
-
-		# MAYBE/#XXX: Need a generic, search-all-fields query?
-		self.add_argument('-s', '--search', '-q', '--query', dest='query',
-			action='append', type=str, metavar='QUERY',
-		)
-
 		# LATER/#ts-178: Add 'deleted' column to 'fact' table.
 		#
 		#                Because if you put wrong time/date in GUI,
@@ -316,11 +436,11 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 		self.cli_opts.cli_optsless = False
 
 		if self.cli_opts.be_verbose:
-			pyoiler_logging.setLevel(pyoiler_logging.DEBUG)
+			setup_logging('DEBUG')
 		elif self.cli_opts.show_sql:
-			pyoiler_logging.setLevel(pyoiler_logging.INFO)
+			setup_logging('INFO')
 		else:
-			pyoiler_logging.setLevel(pyoiler_logging.WARNING)
+			setup_logging('WARNING')
 
 		if self.cli_opts.week_starts:
 			try:
@@ -401,6 +521,11 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 		if self.cli_opts.do_aggregate:
 			self.cli_opts.do_list_types += ['egg',]
 
+		if self.cli_opts.check_gaps:
+			self.cli_opts.do_list_types += ['gaps',]
+		if self.cli_opts.check_overlaps:
+			self.cli_opts.do_list_types += ['overlaps',]
+
 		if ((self.cli_opts.prev_week is not None) or
 			(self.cli_opts.prev_month is not None)
 		):
@@ -674,8 +799,10 @@ class HR_Argparser(pyoiler_argparse.ArgumentParser_Wrap):
 
 class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 
-	def __init__(self, argparser=HR_Argparser):
+	def __init__(self, argparser=HR_Argparser, briefs_server=None):
 		pyoiler_argparse.Simple_Script_Base.__init__(self, argparser)
+		# Set when running a request for `hamster-briefs --serve`.
+		self.briefs_server = briefs_server
 
 	def go_main(self):
 		log.debug('go_main: cli_opts: %s' % (self.cli_opts,))
@@ -683,8 +810,114 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		#opts_list = ["%s: %s" % (x,y) for (x,y) in vars(self.cli_opts).items()]
 		#log.debug('go_main: %s' % ("\n".join(opts_list)))
 
+		if self.cli_opts.serve:
+			if self.briefs_server is not None:
+				log.warning('Already serving.')
+				return
+			from hamster_briefs import briefs_server
+			server = briefs_server.Briefs_Server(
+				Hamsterer, socket_path=self.cli_opts.socket_path,
+			)
+			try:
+				server.serve_forever()
+			except (briefs_server.Briefs_Server_Error, OSError) as err:
+				log.fatal('Cannot serve: %s' % (str(err),))
+				sys.exit(1)
+			return
+
+		self.n_open_facts = 0
+		self.output_errors = False
+
+		if not self.use_result_cache():
+			self.print_reports()
+			return
+
+		if self.briefs_server is not None:
+			cache = self.briefs_server.result_cache
+		else:
+			cache = result_cache.Result_Cache(
+				self.cli_opts.cache_dir, self.cli_opts.cache_size * 1024 * 1024,
+			)
+		cache_key = self.result_cache_key()
+		output = cache.get(cache_key)
+		if output is not None:
+			log.debug('go_main: cache hit: %s' % (cache_key,))
+			sys.stdout.write(output)
+			return
+
+		stdout = sys.stdout
+		sys.stdout = result_cache.Output_Tee(stdout, cache.max_bytes)
 		try:
-			self.conn = sqlite3.connect(self.cli_opts.hamster_db_path)
+			self.print_reports()
+			output = sys.stdout.getvalue()
+		finally:
+			sys.stdout = stdout
+		# The open fact's duration changes with the clock, so don't keep it.
+		if (output is not None) and (not self.n_open_facts) and (not self.output_errors):
+			cache.put(cache_key, output)
+
+	# Options that change how we make the reports, but not what they say.
+	CACHE_IGNORE_OPTS = set([
+		'be_verbose',
+		'show_sql',
+		'sqlite3_mode',
+		'report_engine',
+		'use_rollup',
+		'follow_interval',
+		'jobs',
+		'use_cache',
+		'cache_dir',
+		'cache_size',
+		'socket_path',
+	])
+
+	def use_result_cache(self):
+		return (
+			(self.cli_opts.use_cache or (self.briefs_server is not None))
+			# These print timings, or change the database.
+			and not self.cli_opts.explain
+			and not self.cli_opts.check_indexes
+			and not self.cli_opts.ensure_indexes
+			and not self.cli_opts.rollup_rebuild
+			and not self.cli_opts.search_rebuild
+			# And this never ends.
+			and not self.cli_opts.follow
+		)
+
+	def result_cache_key(self):
+		db_path = os.path.realpath(self.cli_opts.hamster_db_path)
+		report_opts = sorted([
+			(name, repr(value),) for (name, value) in vars(self.cli_opts).items()
+			if name not in Hamsterer.CACHE_IGNORE_OPTS
+		])
+		return result_cache.Result_Cache.make_key(
+			hamster_briefs.version_hamster.SCRIPT_VERS,
+			db_path,
+			result_cache.db_state_token(db_path),
+			report_opts,
+		)
+
+	def connect_db(self):
+		if self.briefs_server is not None:
+			return self.briefs_server.connection(self.cli_opts.hamster_db_path)
+		return sqlite3.connect(self.cli_opts.hamster_db_path)
+
+	def close_db(self):
+		if self.briefs_server is None:
+			self.conn.close()
+		else:
+			# Keep the server's connection, but not our temp table.
+			self.conn.rollback()
+			for table_name in (Hamsterer.FACT_DURATIONS_TABLE, Hamsterer.CALENDAR_TABLE,):
+				self.conn.execute("DROP TABLE IF EXISTS temp.%s" % (table_name,))
+			if (self.fact_search is not None) and (not self.sql_external):
+				self.fact_search.detach(self.conn)
+		self.curs = None
+		self.conn = None
+
+	def print_reports(self):
+		try:
+			self.conn = self.connect_db()
 			self.curs = self.conn.cursor()
 		except Exception as err:
 			log.fatal('Report failed: %s [%s]' % (
@@ -692,8 +925,25 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			))
 			sys.exit(1)
 
+		self.setup_sqlite3_mode()
+
 		self.check_integrity()
 
+		self.setup_filter_ids()
+		self.setup_fact_search()
+
+		self.fact_durations_ready = False
+		self.calendar_ready = False
+		self.sql_live_from = None
+		self.daily_rollup = None
+		self.union_reports = False
+		self.union_branches = None
+
+		if self.cli_opts.check_indexes or self.cli_opts.ensure_indexes:
+			self.check_indexes(create=self.cli_opts.ensure_indexes)
+			self.close_db()
+			return
+
 		# See THIS_IS_THE_DEFAULT_BEHAVIOUR for the default behavior.
 
 		if ((self.cli_opts.do_list_all)
@@ -709,13 +959,28 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				'Unknown print list display output types: %s' % (unknown_types,)
 			)
 
-		for list_type in self.cli_opts.do_list_types:
-			self.list_type = list_type
-			self.process_list_type(list_type)
+		self.setup_daily_rollup()
 
-		self.conn.close()
-		self.curs = None
-		self.conn = None
+		if self.cli_opts.follow:
+			self.follow_reports()
+		else:
+			self.setup_brief_engine()
+
+			report_pool = self.setup_report_pool()
+			if report_pool is None:
+				for list_types in self.union_list_types():
+					if len(list_types) > 1:
+						self.list_union_reports(list_types)
+						continue
+					self.list_type = list_types[0]
+					self.process_list_type(self.list_type)
+			else:
+				self.print_reports_pooled(report_pool)
+
+		self.close_db()
+		if self.sql_coprocess is not None:
+			self.sql_coprocess.close()
+			self.sql_coprocess = None
 
 		if self.cli_opts.cli_optsless:
 			# Just a silly helper for newbies who run without options.
@@ -727,14 +992,221 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			print('For more general help, try')
 			print('  %s --help' % (sys.argv[0],))
 
+	# *** --jobs
+
+	def setup_report_pool(self):
+		from hamster_briefs import report_jobs
+		n_jobs = self.cli_opts.jobs
+		if n_jobs == 0:
+			n_jobs = report_jobs.default_jobs()
+		if n_jobs <= 1:
+			return None
+		why_not = None
+		if self.sql_external:
+			why_not = 'it needs Python sqlite3 (--sqlite3 internal)'
+		elif self.briefs_server is not None:
+			why_not = 'not via --serve'
+		elif self.cli_opts.explain:
+			why_not = '--explain times each report alone'
+		elif self.union_reports:
+			why_not = '--engine union runs them as one query'
+		if why_not:
+			log.info('Not using --jobs: %s.' % (why_not,))
+			return None
+		pooled_types = self.pooled_list_types()
+		if len(pooled_types) < 2:
+			return None
+		rollup_path = None
+		if self.daily_rollup is not None:
+			rollup_path = self.daily_rollup.rollup_path
+		return report_jobs.Report_Pool(
+			Hamsterer,
+			min(n_jobs, len(pooled_types)),
+			self.cli_opts,
+			rollup_path=rollup_path,
+			live_from=self.sql_live_from,
+		)
+
+	def pooled_list_types(self):
+		# The SQL reports; the brief engine's are already computed.
+		return [
+			x for x in self.cli_opts.do_list_types
+			if (x in HR_Argparser.all_report_types)
+			and (x != 'all')
+			and (
+				(self.brief_engine is None)
+				or (x not in self.brief_engine.reports)
+			)
+		]
+
+	def print_reports_pooled(self, report_pool):
+		# Submit them all, then print them in order, as they finish.
+		pooled_types = set(self.pooled_list_types())
+		futures = {}
+		try:
+			for list_type in self.cli_opts.do_list_types:
+				if list_type in pooled_types and list_type not in futures:
+					futures[list_type] = report_pool.submit(list_type)
+			for list_type in self.cli_opts.do_list_types:
+				self.list_type = list_type
+				if list_type not in pooled_types:
+					self.process_list_type(list_type)
+					continue
+				(output, output_errors) = futures[list_type].result()
+				sys.stdout.write(output)
+				if output_errors:
+					self.output_errors = True
+		finally:
+			report_pool.close()
+
+	def setup_report_job(self, cli_opts, rollup_path=None, live_from=None):
+		# Called in a report_jobs worker process, in lieu of go_main.
+		from hamster_briefs import report_jobs
+		self.cli_opts = cli_opts
+		self.n_open_facts = 0
+		self.output_errors = False
+		self.conn = report_jobs.connect_read_only(cli_opts.hamster_db_path)
+		self.curs = self.conn.cursor()
+		self.sql_external = False
+		self.sql_caps = sqlite_caps.module_caps()
+		self.sql_coprocess = None
+		self.brief_engine = None
+		self.union_reports = False
+		self.union_branches = None
+		self.fact_durations_ready = False
+		self.calendar_ready = False
+		self.sql_live_from = None
+		self.daily_rollup = None
+		self.setup_filter_ids()
+		self.setup_fact_search(sync=False)
+		if rollup_path:
+			# The parent already synced it; we just read it.
+			from hamster_briefs import daily_rollup
+			rollup = daily_rollup.Daily_Rollup(self.conn, rollup_path)
+			rollup.attach()
+			self.daily_rollup = rollup
+			self.sql_live_from = live_from
+
+	def setup_sqlite3_mode(self):
+		sqlite3_mode = self.cli_opts.sqlite3_mode
+		if sqlite3_mode == 'auto':
+			sqlite3_mode = 'coprocess' if Hamsterer.sqlite3_too_old() else 'internal'
+		self.sql_external = (sqlite3_mode != 'internal')
+		# What the SQLite that runs the reports can do, so the query
+		# builders can pick the SQL to use (see sqlite_caps).
+		if not self.sql_external:
+			self.sql_caps = sqlite_caps.module_caps()
+		else:
+			self.sql_caps = sqlite_caps.executable_caps()
+		log.debug('setup_sqlite3_mode: %s' % (self.sql_caps.describe(),))
+		self.sql_coprocess = None
+		# What each sqlite3 subprocess runs before the report (see
+		# setup_sql_calendar).
+		self.sql_session_setup = ''
+		if sqlite3_mode == 'coprocess':
+			from hamster_briefs import sqlite_coproc
+			self.sql_coprocess = sqlite_coproc.Sqlite3_Coprocess(
+				self.cli_opts.hamster_db_path,
+			)
+
+	def check_indexes(self, create=False):
+		from hamster_briefs import index_advisor
+		print()
+		header = 'REPORT INDEXES [%s]' % (
+			'ensure-indexes' if create else 'check-indexes',
+		)
+		print(header)
+		print('=' * len(header))
+		created = []
+		if create:
+			try:
+				created = index_advisor.ensure_indexes(self.conn)
+			except sqlite3.Error as err:
+				log.fatal('Could not create indexes: %s' % (str(err),))
+				sys.exit(1)
+		for (spec, existing) in index_advisor.advise_indexes(self.conn):
+			if spec in created:
+				status = 'created'
+			elif existing:
+				status = 'ok'
+			elif not spec.supported():
+				status = 'sqlite<%s' % ('.'.join([str(x) for x in spec.min_sqlite]),)
+			else:
+				status = 'MISSING'
+			print('%s|%s|%s' % (status, existing or spec.create_sql(), spec.reason,))
+		if create:
+			print('ANALYZE|done')
+
+		# Show what the reports' SQLite can do (and so which SQL they use).
+		print()
+		header = 'SQLITE CAPABILITIES'
+		print(header)
+		print('=' * len(header))
+		print(self.sql_caps.describe())
+		for (name, used_by, setup, check) in sqlite_caps.CAPABILITY_PROBES:
+			print('%s|%s|%s' % (
+				'yes' if name in self.sql_caps.capabilities else 'no',
+				name,
+				used_by,
+			))
+
+		# Show how the (unfiltered by name) report query reads facts now.
+		print()
+		header = 'FACT DURATIONS QUERY PLAN'
+		print(header)
+		print('=' * len(header))
+		self.setup_sql_fact_durations(materialize=False)
+		for outln in self.explain_query_plan_lines(self.sql_fact_durations):
+			print(outln)
+
+	def explain_query_plan_lines(self, sql_select):
+		from hamster_briefs import index_advisor
+		sql_explain = "EXPLAIN QUERY PLAN %s" % (sql_select,)
+		if not self.sql_external:
+			plan_steps = index_advisor.query_plan_depths(
+				self.conn.execute(sql_explain, self.sql_params).fetchall()
+			)
+		elif self.sql_coprocess is not None:
+			plan_steps = index_advisor.parse_plan_lines(
+				list(self.sql_coprocess.query_lines(sql_explain))
+			)
+		else:
+			import subprocess
+			ret = subprocess.run(
+				['sqlite3', self.cli_opts.hamster_db_path, '%s;' % (sql_explain,),],
+				stdout=subprocess.PIPE,
+				stderr=subprocess.DEVNULL,
+			)
+			plan_steps = index_advisor.parse_plan_lines(
+				ret.stdout.decode('utf-8').split('\n')
+			)
+		return index_advisor.format_query_plan(plan_steps)
+
+	def explain_query_plan(self, sql_select, what):
+		# Print as SQL comments, so the report lines still parse the same.
+		print('-- QUERY PLAN [%s]' % (what,))
+		for outln in self.explain_query_plan_lines(sql_select):
+			print('-- %s' % (outln,))
+		self.explain_n_rows = 0
+		return time.perf_counter()
+
+	def explain_query_timing(self, time_0, what, n_rows=None):
+		print('-- %d rows in %.1f ms [%s]' % (
+			self.explain_n_rows if n_rows is None else n_rows,
+			1000.0 * (time.perf_counter() - time_0),
+			what,
+		))
+
 	def check_integrity(self):
 		facts_still_open = """
 			FROM facts WHERE end_time IS NULL AND NOT deleted
 		"""
 		sql_select = "SELECT COUNT(*) {}".format(facts_still_open)
+		self.setup_sql_setup()
 		try:
 			self.curs.execute(sql_select)
 			count = self.curs.fetchone()
+			self.n_open_facts = count[0]
 			if count[0] not in (0, 1):
 				log.fatal(
 					'DATA ERROR: Unexpected count: %s / query: %s'
@@ -748,8 +1220,586 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			log.fatal('SQL statement failed: %s' % (str(err),))
 			log.fatal('sql_select: %s' % (sql_select,))
 
-		# FIXME/LATER/#XXX: Check for gaps. If lots of facts, maybe just check
-		# facts in specified time.
+		# NOTE: Gaps and overlaps aren't fatal; see --gaps and --overlaps.
+
+	def setup_fact_search(self, sync=True):
+		self.fact_search = None
+		self.search_query = ''
+		if not (self.cli_opts.query or self.cli_opts.description):
+			return
+		from hamster_briefs import fact_search
+		self.search_query = fact_search.match_query(
+			self.cli_opts.query, self.cli_opts.description,
+		)
+		if not self.search_query:
+			return
+		# We index and search with Python's sqlite3, whatever --sqlite3 says.
+		if not sqlite_caps.module_caps().fts5:
+			log.fatal('--query and --description need SQLite with FTS5: %s' % (
+				sqlite_caps.module_caps().describe(),
+			))
+			sys.exit(1)
+		search = fact_search.Fact_Search(
+			fact_search.search_path_for(self.cli_opts.hamster_db_path),
+		)
+		self.fact_search = search
+		if sync:
+			self.sync_fact_search()
+		if not self.sql_external:
+			try:
+				search.attach(self.conn)
+			except sqlite3.Error as err:
+				log.fatal('Cannot search: %s [%s]' % (str(err), search.search_path,))
+				sys.exit(1)
+
+	def sync_fact_search(self):
+		search = self.fact_search
+		try:
+			search.sync(
+				self.cli_opts.hamster_db_path, rebuild=self.cli_opts.search_rebuild,
+			)
+			if self.sql_external:
+				# The sqlite3 executable gets the fact IDs instead.
+				self.search_fact_ids = search.fact_ids(self.search_query)
+		except sqlite3.Error as err:
+			# E.g., "no such module: fts5".
+			log.fatal('Cannot search: %s [%s]' % (str(err), search.search_path,))
+			sys.exit(1)
+		log.debug('sync_fact_search: query: %s / indexed: %d' % (
+			self.search_query, search.n_indexed,
+		))
+
+	def setup_sql_fact_search(self):
+		self.sql_fact_search = ''
+		self.sql_fact_search_ = ''
+		# NOTE: The unary + keeps SQLite from driving the query from the
+		#       matches (it guesses there are few), which makes it skip the
+		#       automatic index on fact_tags, and scan fact_tags per fact.
+		if self.fact_search is not None:
+			if not self.sql_external:
+				self.sql_params.append(self.search_query)
+				self.sql_fact_search = (
+					"+facts.id IN (SELECT rowid FROM %s.fact_search WHERE fact_search MATCH ?)"
+					% (self.fact_search.schema,)
+				)
+			else:
+				self.sql_fact_search_ = "+facts.id IN (%s)" % (
+					','.join([str(x) for x in self.search_fact_ids]) or 'NULL',
+				)
+		if not self.sql_external:
+			self.str_params['SQL_FACT_SEARCH'] = self.sql_fact_search
+		else:
+			self.str_params['SQL_FACT_SEARCH'] = self.sql_fact_search_
+
+	# The reports that only need the daily totals (and not each fact).
+	ROLLUP_REPORT_FAMILIES = ('gross', 'daily', 'satsun', 'sprint',)
+
+	RE_WHOLE_DAY = re.compile(r'^\d{4}-\d{2}-\d{2}( 00:00(:00)?)?$')
+
+	def setup_daily_rollup(self):
+		self.daily_rollup = None
+		self.sql_live_from = None
+		if not (self.cli_opts.use_rollup or self.cli_opts.rollup_rebuild):
+			return
+		why_not = None
+		if self.sql_external:
+			why_not = 'it needs Python sqlite3 (--sqlite3 internal)'
+		elif self.briefs_server is not None:
+			why_not = 'the --serve connection is read-only'
+		elif self.cli_opts.follow:
+			why_not = '--follow reads its own facts'
+		elif self.cli_opts.activities or self.cli_opts.tags:
+			why_not = 'it does not track -a/-t filters'
+		elif self.fact_search is not None:
+			why_not = 'it does not track --query filters'
+		elif [
+			x for x in self.cli_opts.do_list_types
+			if x.split('-')[0] not in Hamsterer.ROLLUP_REPORT_FAMILIES
+		]:
+			why_not = 'only the gross, daily, and weekly reports use it'
+		elif [
+			x for x in (self.cli_opts.time_beg, self.cli_opts.time_end,)
+			if x and not Hamsterer.RE_WHOLE_DAY.match(str(x).strip())
+		]:
+			why_not = 'it needs -b/-e to be whole days'
+		if why_not:
+			log.info('Not using the daily rollup: %s.' % (why_not,))
+			return
+		from hamster_briefs import daily_rollup
+		rollup = daily_rollup.Daily_Rollup(
+			self.conn, daily_rollup.rollup_path_for(self.cli_opts.hamster_db_path),
+		)
+		try:
+			rollup.attach()
+			self.sql_live_from = rollup.sync(
+				self.sql_fact_durations_range(),
+				rebuild=self.cli_opts.rollup_rebuild,
+			)
+		except sqlite3.Error as err:
+			log.warning('Not using the daily rollup: %s [%s]' % (
+				str(err), rollup.rollup_path,
+			))
+			self.conn.rollback()
+			self.sql_live_from = None
+			return
+		self.daily_rollup = rollup
+		log.debug('setup_daily_rollup: live_from: %s / roll_ups: %d' % (
+			self.sql_live_from, rollup.n_roll_ups,
+		))
+
+	def sql_fact_durations_range(self):
+		# The unfiltered fact durations, between two '?' start_times.
+		self.setup_sql_fact_durations(materialize=False)
+		str_params = dict(self.str_params)
+		str_params['SQL_BEG_DATE'] = "AND facts.start_time >= datetime(?)"
+		str_params['SQL_END_DATE'] = "AND facts.start_time < datetime(?)"
+		str_params['SQL_LIVE_FROM'] = ''
+		str_params['SQL_ACTS_AND_TAGS'] = ''
+		str_params['REPORT_CATEGORIES'] = ''
+		str_params['SQL_CATEGORY_START_TIMES'] = ''
+		return Hamsterer.sql_fact_durations_format(
+			str_params, self.sql_window_functions(), self.sql_unixepoch(),
+		)
+
+	def setup_sql_live_from(self):
+		# Read only the facts that start at or after sql_live_from: what the
+		# daily rollup hasn't rolled up, or what --follow sees changed.
+		self.str_params['SQL_LIVE_FROM'] = ''
+		if self.sql_live_from:
+			self.sql_params.append(self.sql_live_from)
+			self.str_params['SQL_LIVE_FROM'] = "AND facts.start_time >= datetime(?)"
+
+	def setup_sql_rollup_days(self, table_name):
+		# Add the closed days' totals, one row per day, activity, and tag set,
+		# to the fact durations table, in the shape of its (live) fact rows.
+		sql_params = [self.sql_live_from,]
+		sql_days = ''
+		if self.cli_opts.time_beg:
+			sql_params.append(str(self.cli_opts.time_beg))
+			sql_days += " AND daily_rollup.day >= date(?)"
+		if self.cli_opts.time_end:
+			sql_params.append(str(self.cli_opts.time_end))
+			# E.g., -e '2017-06-01' or '2017-06-01 00:00' is through May 31.
+			sql_days += " AND daily_rollup.day < date(?)"
+		sql_insert = """
+			INSERT INTO temp.%(FACT_DURATIONS_TABLE)s
+			SELECT
+				calendar.yrjul
+				, calendar.day_of_week
+				, calendar.day_name
+				, calendar.pseudo_week_offset
+				, calendar.week_start
+				, calendar.satsun_week
+				, calendar.sprint_week
+				, daily_rollup.start_time
+				, daily_rollup.duration
+				, categories.name AS category_name
+				, activities.name AS activity_name
+				, daily_rollup.activity_id
+				, NULL AS fact_id
+				, daily_rollup.tag_names
+				, NULL AS description
+			FROM %(ROLLUP_SCHEMA)s.daily_rollup
+			JOIN temp.calendar ON (calendar.day = daily_rollup.day)
+			JOIN activities ON (activities.id = daily_rollup.activity_id)
+			JOIN categories ON (categories.id = activities.category_id)
+			WHERE daily_rollup.day < ?
+				%(SQL_ROLLUP_DAYS)s
+				%(REPORT_CATEGORIES)s
+		""" % dict(
+			self.str_params,
+			FACT_DURATIONS_TABLE=table_name,
+			ROLLUP_SCHEMA=self.daily_rollup.schema,
+			SQL_ROLLUP_DAYS=sql_days,
+		)
+		if self.cli_opts.show_sql:
+			log.info(sql_insert)
+		self.curs.execute(sql_insert, sql_params)
+
+	def setup_brief_engine(self):
+		self.brief_engine = None
+		self.union_reports = False
+		self.union_branches = None
+		if self.cli_opts.report_engine == 'sql':
+			return
+		if self.sql_external:
+			log.warning('The %s engine needs Python sqlite3 >= 3.8.3; using sql.' % (
+				self.cli_opts.report_engine,
+			))
+			return
+		if self.cli_opts.report_engine == 'union':
+			self.union_reports = True
+			return
+		if self.cli_opts.report_engine == 'numpy':
+			if brief_engine.load_numpy() is None:
+				log.warning('The numpy engine needs numpy installed; using scan.')
+				engine_class = brief_engine.Brief_Engine
+			else:
+				engine_class = brief_engine.Brief_Numpy_Engine
+		else:
+			engine_class = brief_engine.Brief_Engine
+		engine = engine_class(
+			self.cli_opts.do_list_types,
+			show_cats=self.cli_opts.show_cats,
+			show_tags=self.cli_opts.show_tags,
+			first_sprint_week_num=self.cli_opts.first_sprint_week_num,
+		)
+		if not engine.reports:
+			return
+		self.setup_sql_fact_durations()
+		grain_columns = None
+		if engine_class is brief_engine.Brief_Engine:
+			grain_columns = engine.grain_columns()
+		if grain_columns is None:
+			# One row per fact.
+			sql_select = """
+				SELECT
+					yrjul
+					, julianday(start_time) AS start_jd
+					, pseudo_week_offset
+					, satsun_week
+					, sprint_week
+					, duration
+					, category_name
+					, activity_name
+					, activity_id
+					, tag_names
+				FROM (%(SQL_FACT_DURATIONS)s) AS project_time
+			""" % self.str_params
+		else:
+			# One row per group of the engine's finest report, which it rolls
+			# up into the rest. The bare columns come from the group's first
+			# fact (as the reports' own GROUP BYs' do).
+			sql_select = """
+				SELECT
+					yrjul
+					, julianday(min(start_time)) AS start_jd
+					, pseudo_week_offset
+					, satsun_week
+					, sprint_week
+					, sum(duration) AS duration
+					, category_name
+					, activity_name
+					, activity_id
+					, tag_names
+				FROM (%s) AS project_time
+				%s
+				ORDER BY start_jd
+			""" % (
+				self.str_params['SQL_FACT_DURATIONS'],
+				'GROUP BY %s' % (', '.join(grain_columns),) if grain_columns
+					else 'HAVING count(*) > 0',
+			)
+		if self.cli_opts.show_sql:
+			log.info(sql_select)
+		if self.cli_opts.explain:
+			time_0 = self.explain_query_plan(sql_select, 'engine: %s' % (
+				self.cli_opts.report_engine,
+			))
+		self.curs.execute(sql_select, self.sql_params)
+		engine.add_facts(self.curs)
+		self.brief_engine = engine
+		if self.cli_opts.explain:
+			self.explain_query_timing(time_0, 'engine: %s' % (
+				self.cli_opts.report_engine,
+			), n_rows=engine.n_facts)
+
+	# *** --engine union
+
+	UNION_REPORT_FAMILIES = ('satsun', 'sprint', 'gross',)
+
+	def union_list_types(self):
+		# Yield each report to run on its own, as a list of one, and each
+		# run of satsun, sprint, or gross reports to run as one query.
+		# (One family per query, so the fact grain has one week column.)
+		union_types = []
+		for list_type in self.cli_opts.do_list_types:
+			family = list_type.split('-')[0]
+			if union_types and (family != union_types[0].split('-')[0]):
+				yield union_types
+				union_types = []
+			if (
+				self.union_reports
+				and (family in Hamsterer.UNION_REPORT_FAMILIES)
+				and brief_engine.Brief_Report.supports(list_type)
+			):
+				union_types.append(list_type)
+				continue
+			if union_types:
+				yield union_types
+				union_types = []
+			yield [list_type,]
+		if union_types:
+			yield union_types
+
+	# Each report's GROUP BY reads the fact durations grouped by the
+	# columns of all the reports, which is (a lot) fewer rows than facts.
+	# The bare week_start is from each group's first fact, as are the
+	# reports' (which see the groups in start_time order, like the facts).
+	SQL_UNION_FACT_GRAIN = """
+		WITH fact_grain AS (
+			SELECT
+				min(start_time) AS start_time
+				, week_start
+				, satsun_week
+				, sprint_week
+				, sum(duration) AS duration
+				, category_name
+				, activity_name
+				, tag_names
+			FROM (%(SQL_FACT_DURATIONS)s) AS project_time
+			%(SQL_GRAIN_GROUP_BY)s
+			ORDER BY start_time
+		)
+	"""
+
+	def list_union_reports(self, list_types):
+		import contextlib
+		import itertools
+		# Run the list_* fcns. as usual, but keep what they print (their
+		# headers), and have list_weekly_wrap save its SQL, not run it.
+		sections = []
+		self.union_branches = []
+		try:
+			for list_type in list_types:
+				self.list_type = list_type
+				headers = io.StringIO()
+				with contextlib.redirect_stdout(headers):
+					self.process_list_type(list_type)
+				sections.append(headers.getvalue())
+			branches = self.union_branches
+		finally:
+			self.union_branches = None
+		grain_columns = []
+		for column in ('satsun_week', 'sprint_week', 'category_name', 'activity_name', 'tag_names',):
+			if [x for x in branches if column in x[2]]:
+				grain_columns.append(column)
+		if self.cli_opts.show_tags and ('tag_names' not in grain_columns):
+			grain_columns.append('tag_names')
+		self.str_params['SQL_GRAIN_GROUP_BY'] = (
+			'GROUP BY %s' % (', '.join(grain_columns),) if grain_columns
+			else 'HAVING count(*) > 0'
+		)
+		# Each report is its own sorted subquery (the LIMIT keeps SQLite
+		# from dropping its ORDER BY), with a report_nth discriminator
+		# and NULLs to pad to the widest report's columns.
+		max_cols = max([len(x[1].columns) for x in branches])
+		sql_union = Hamsterer.SQL_UNION_FACT_GRAIN % self.str_params
+		sql_union += "\n\t\tUNION ALL\n".join([
+			"""
+		SELECT %d AS report_nth, *%s FROM (%s
+			LIMIT -1
+		)
+			""" % (
+				report_nth,
+				''.join([', NULL'] * (max_cols - len(renderer.columns))),
+				sql_select,
+			)
+			for (report_nth, (sql_select, renderer, group_bys)) in enumerate(branches)
+		])
+		if self.cli_opts.show_sql:
+			log.info(sql_union)
+		what = 'union: %s' % (', '.join(list_types),)
+		if self.cli_opts.explain:
+			time_0 = self.explain_query_plan(sql_union, what)
+		# The report whose section we're on (from which, if the query
+		# fails, we run the reports the usual way, one by one).
+		failed_nth = 0
+		try:
+			self.curs.execute(sql_union, self.sql_params)
+			section_rows = itertools.groupby(self.curs, key=lambda row: row[0])
+			next_rows = None
+			for (report_nth, headers) in enumerate(sections):
+				failed_nth = report_nth
+				if next_rows is None:
+					next_rows = next(section_rows, ())
+				outlns = []
+				if next_rows and (next_rows[0] == report_nth):
+					# Sans the report_nth (and the renderer skips the padding).
+					renderer = branches[report_nth][1]
+					outlns = renderer.output_lines(row[1:] for row in next_rows[1])
+					# NOTE: Read the section's rows before we print its
+					#       headers, so if SQLite fails partway, we haven't
+					#       printed half a report.
+					outlns = list(self.output_reassemble_split_line_comments(outlns))
+					next_rows = None
+				sys.stdout.write(headers)
+				self.output_print_lines(outlns)
+			failed_nth = None
+		except sqlite3.Error as err:
+			log.warning('Union query failed: %s; running the reports one by one.' % (
+				str(err),
+			))
+			log.debug('sql_select: %s' % (sql_union,))
+		if self.cli_opts.explain:
+			self.explain_query_timing(time_0, what)
+		if failed_nth is not None:
+			for list_type in list_types[failed_nth:]:
+				self.list_type = list_type
+				self.process_list_type(list_type)
+
+	# *** --follow
+
+	def follow_reports(self):
+		why_not = None
+		if self.sql_external:
+			why_not = 'it needs Python sqlite3 (--sqlite3 internal)'
+		elif self.briefs_server is not None:
+			why_not = 'not via --serve'
+		if why_not:
+			log.fatal('Cannot --follow: %s.' % (why_not,))
+			sys.exit(1)
+		unsupported = [
+			x for x in self.cli_opts.do_list_types
+			if x not in self.follow_new_engine().reports
+		]
+		if unsupported:
+			log.warning('--follow only follows the daily, weekly, and gross reports, not: %s' % (
+				', '.join(unsupported),
+			))
+		# The engine prints every report, so the list_* fcns. only format,
+		# but never run, their SQL (and needn't materialize fact_durations).
+		self.fact_durations_ready = True
+
+		self.follow_rows = []
+		self.follow_refresh(None)
+		data_version = self.follow_data_version()
+		last_output = None
+		try:
+			while True:
+				curr_version = self.follow_data_version()
+				if curr_version != data_version:
+					data_version = curr_version
+					self.follow_refresh(self.follow_changed_from())
+				output = self.follow_output()
+				if output != last_output:
+					self.follow_print(output)
+					last_output = output
+				time.sleep(self.cli_opts.follow_interval)
+		except KeyboardInterrupt:
+			pass
+
+	def follow_new_engine(self):
+		return brief_engine.Brief_Engine(
+			self.cli_opts.do_list_types,
+			show_cats=self.cli_opts.show_cats,
+			show_tags=self.cli_opts.show_tags,
+			first_sprint_week_num=self.cli_opts.first_sprint_week_num,
+		)
+
+	def follow_data_version(self):
+		# Changes whenever another connection commits to hamster.db.
+		return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+	def follow_refresh(self, live_from):
+		# Re-read the facts that start at or after live_from (or all of them).
+		if self.fact_search is not None:
+			self.sync_fact_search()
+		self.sql_live_from = live_from
+		# Rebuild the calendar, in case the new facts start after it ends.
+		self.calendar_ready = False
+		self.setup_sql_fact_durations(materialize=False)
+		self.sql_live_from = None
+		sql_select = """
+			SELECT
+				yrjul
+				, julianday(start_time) AS start_jd
+				, pseudo_week_offset
+				, satsun_week
+				, sprint_week
+				, duration
+				, category_name
+				, activity_name
+				, activity_id
+				, tag_names
+				, fact_id
+				, start_time
+			FROM (%(SQL_FACT_DURATIONS)s) AS project_time
+		""" % self.str_params
+		if self.cli_opts.show_sql:
+			log.info(sql_select)
+		fact_rows = self.conn.execute(sql_select, self.sql_params).fetchall()
+		if live_from is not None:
+			fact_rows = [x for x in self.follow_rows if x[-1] < live_from] + fact_rows
+		self.follow_rows = fact_rows
+		(self.follow_max_id,) = self.conn.execute(
+			"SELECT IFNULL(max(id), 0) FROM facts"
+		).fetchone()
+		self.follow_open_ids = set([row[0] for row in self.conn.execute(
+			"SELECT id FROM facts WHERE end_time IS NULL AND NOT deleted"
+		).fetchall()])
+		log.debug('follow_refresh: live_from: %s / n_rows: %d' % (
+			live_from, len(fact_rows),
+		))
+
+	def follow_changed_from(self):
+		# Return the earliest start_time of what changed: new facts, the
+		# open fact, and the fact that was open. If nothing changed that
+		# we can see (e.g., an old fact was edited), return None, to
+		# re-read them all.
+		new_open_ids = set([row[0] for row in self.conn.execute(
+			"SELECT id FROM facts WHERE end_time IS NULL AND NOT deleted"
+		).fetchall()])
+		(n_new, new_beg) = self.conn.execute(
+			"SELECT count(*), min(start_time) FROM facts WHERE id > ?",
+			(self.follow_max_id,)
+		).fetchone()
+		if (not n_new) and (new_open_ids == self.follow_open_ids):
+			return None
+		start_times = [new_beg,] if new_beg else []
+		start_times += [
+			x[-1] for x in self.follow_rows
+			if x[-2] in self.follow_open_ids.union(new_open_ids)
+		]
+		start_times += [row[0] for row in self.conn.execute(
+			"SELECT start_time FROM facts WHERE end_time IS NULL AND NOT deleted"
+		).fetchall()]
+		return min(start_times) if start_times else None
+
+	def follow_output(self):
+		# Everyone's duration is fixed but the open fact's.
+		now_jd = brief_engine.julian_day_now()
+		engine = self.follow_new_engine()
+		for fact_row in self.follow_rows:
+			if fact_row[-2] in self.follow_open_ids:
+				fact_row = list(fact_row)
+				fact_row[5] = int(86400.0 * (now_jd - fact_row[1]))
+			engine.add_fact(*fact_row[:10])
+		self.brief_engine = engine
+		outs = io.StringIO()
+		stdout = sys.stdout
+		sys.stdout = outs
+		try:
+			for list_type in self.cli_opts.do_list_types:
+				if list_type in engine.reports:
+					self.list_type = list_type
+					self.process_list_type(list_type)
+		finally:
+			sys.stdout = stdout
+		return outs.getvalue()
+
+	def follow_print(self, output):
+		if sys.stdout.isatty():
+			# Like `clear`.
+			sys.stdout.write('\033[H\033[2J')
+		sys.stdout.write(output)
+		sys.stdout.flush()
+
+	def print_brief_engine_output(self, output_split_days=False):
+		if (
+			(self.brief_engine is None)
+			or (self.list_type not in self.brief_engine.reports)
+		):
+			return False
+		if self.cli_opts.explain:
+			print('-- (Computed by the %s engine.)' % (self.cli_opts.report_engine,))
+			self.explain_n_rows = 0
+			time_0 = time.perf_counter()
+		outlns = self.brief_engine.output_lines(self.list_type)
+		self.output_print_lines(outlns, output_split_days)
+		if self.cli_opts.explain:
+			self.explain_query_timing(time_0, self.list_type)
+		return True
 
 	def process_list_type(self, list_type):
 		if list_type == 'gross-tag':
@@ -794,6 +1844,10 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			self.list_sprint_weekly_totals()
 		elif list_type == 'egg':
 			self.list_aggregate_results_report()
+		elif list_type == 'gaps':
+			self.list_gaps()
+		elif list_type == 'overlaps':
+			self.list_overlaps()
 		elif list_type == 'all':
 			# Already handled by list_all().
 			pass
@@ -823,27 +1877,44 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 	#       Linux Mint 18: import sqlite3 ; print(sqlite3.sqlite_version): 3.11.0.
 	#
 
-	SQL_EXTERNAL = True
-	sqlite_v = sqlite3.sqlite_version.split('.')
-	if (
-		(int(sqlite_v[0]) > 3)
-		or (int(sqlite_v[1]) > 8)
-		or ((int(sqlite_v[1]) == 8) and (int(sqlite_v[2]) > 2))
-	):
-		SQL_EXTERNAL = False
+	@staticmethod
+	def sqlite3_too_old():
+		# I.e., whether to use the sqlite3 executable instead.
+		return not sqlite_caps.module_caps().printf
 
 	# FIXME/2016-09-26: Linux Mint 18: accessing sqlite3 internally not working.
 	#                   In fact, nothing being returned, it feels like.
 	# 2016-11-13/MEH: Since there's no easy way to update Python sqlite3
 	#                 library (part of the core of python), might as well
 	#                 stick to using the external binaries.
-	SQL_EXTERNAL = True
+	# NOTE: The "nothing being returned" was the internal path printing
+	#       fetchall() and binding the LIKE '%?%' patterns wrong. Now that
+	#       it prints rows the same way `sqlite3 -list` does, use the
+	#       in-process connection whenever the linked library is new
+	#       enough, and only fork the sqlite3 binary on old hosts.
 
 	# A hacky way to add leading spaces/zeros: use substr.
 	# CAVEAT: This hack will strip characters if number of characters exceeds
 	# the substr bounds. So leave one more than expected -- if you don't see
 	# a leading blank, be suspicious.
-	SQL_DURATION = "substr('       ' || printf('%.3f', sum(duration)), -8, 8)"
+	# The durations are seconds; the reports show hours.
+	# NOTE: Not printf('%.3f', seconds / 3600.0): SQLite 3.43 changed how
+	#       printf rounds, e.g., 27 seconds (0.0075 hours) was 0.008 but is
+	#       now 0.007. Round the thousandths of an hour in integers, half
+	#       up, like brief_render.format_duration, so every SQLite (and
+	#       every --sqlite3 mode) prints the same.
+	SQL_HOURS = (
+		"CASE WHEN %(seconds)s < 0 THEN '-' ELSE '' END || printf('%%d.%%03d', "
+		"((abs(%(seconds)s) * 1000 + 1800) / 3600) / 1000, "
+		"((abs(%(seconds)s) * 1000 + 1800) / 3600) %% 1000)"
+	)
+
+	# NOTE: Only the sqlite3 executable needs these, to print the report
+	#       columns. In-process, the reports select the plain values, and
+	#       brief_render formats them (see setup_sql_report_columns).
+	SQL_DURATION = "substr('       ' || %s, -8, 8)" % (
+		SQL_HOURS % {'seconds': 'sum(duration)'},
+	)
 
 	SQL_CATEGORY_FMTS = "substr('            ' || category_name, -12, 12)"
 
@@ -851,20 +1922,20 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		activity_name || '                                                      ', \
 		0, 54)"
 
+	def setup_sql_report_columns(self):
+		if self.sql_external:
+			self.str_params['SQL_DURATION'] = Hamsterer.SQL_DURATION
+			self.str_params['SQL_CATEGORY_FMTS'] = Hamsterer.SQL_CATEGORY_FMTS
+			self.str_params['SQL_ACTIVITY_FMTS'] = Hamsterer.SQL_ACTIVITY_FMTS
+		else:
+			self.str_params['SQL_DURATION'] = 'sum(duration)'
+			self.str_params['SQL_CATEGORY_FMTS'] = 'category_name'
+			self.str_params['SQL_ACTIVITY_FMTS'] = 'activity_name'
+
 	def setup_sql_day_of_week(self):
-		self.sql_day_of_week = (
-			"""
-			CASE CAST(strftime('%w', start_time) AS INTEGER)
-				WHEN 0 THEN 'sun'
-				WHEN 1 THEN 'mon'
-				WHEN 2 THEN 'tue'
-				WHEN 3 THEN 'wed'
-				WHEN 4 THEN 'thu'
-				WHEN 5 THEN 'fri'
-					   ELSE 'sat'
-			END AS day_of_week
-			"""
-		)
+		# The calendar's day_name, or 'sat' if there's no day (e.g., for the
+		# one row an empty gross-totals prints).
+		self.sql_day_of_week = "IFNULL(day_name, 'sat') AS day_of_week"
 		self.str_params['SQL_DAY_OF_WEEK'] = self.sql_day_of_week
 
 	def setup_sql_week_starts(self):
@@ -872,38 +1943,54 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 
 	def setup_sql_categories(self):
 		self.sql_categories = ''
-		self.sql_categories_ = ''
-		if self.cli_opts.categories:
-			assert(isinstance(self.cli_opts.categories, list))
-			self.sql_params.extend(self.cli_opts.categories)
-
-			qmark_list = ','.join(['?' for x in self.cli_opts.categories])
+		if self.category_ids is not None:
 			self.sql_categories = (
-				"AND categories.name IN (%s)" % (qmark_list,)
-				#"AND categories.search_name IN (%s)" % (qmark_list,)
-			)
-			name_list = ','.join(["'%s'" % (x,) for x in self.cli_opts.categories])
-			self.sql_categories_ = (
-				" AND categories.name IN (%s)" % (name_list,)
-				#" AND categories.search_name IN (%s)" % (name_list,)
+				"AND categories.id IN (%s)" % (Hamsterer.sql_id_list(self.category_ids),)
 			)
-		if not Hamsterer.SQL_EXTERNAL:
-			self.str_params['REPORT_CATEGORIES'] = self.sql_categories
-		else:
-			self.str_params['REPORT_CATEGORIES'] = self.sql_categories_
+		self.str_params['REPORT_CATEGORIES'] = self.sql_categories
+
+	# We dedupe facts that start at the same time before we filter by
+	# category (so -c shows a subset of what the unfiltered report shows),
+	# but we needn't join the tags of, nor dedupe, the facts that start
+	# when no fact in the categories does. So -c only lets through the
+	# facts that start at the same time as a fact in the categories
+	# (usually, just the facts in the categories).
+	def setup_sql_category_start_times(self):
+		self.str_params['SQL_CATEGORY_START_TIMES'] = ''
+		if self.category_ids is None:
+			return
+		if not self.sql_external:
+			for time_param in (self.cli_opts.time_beg, self.cli_opts.time_end,):
+				if time_param:
+					self.sql_params.append(str(time_param))
+		self.str_params['SQL_CATEGORY_START_TIMES'] = """
+					AND facts.start_time IN (
+						SELECT facts.start_time
+						FROM facts
+						JOIN activities ON (activities.id = facts.activity_id)
+						WHERE NOT facts.deleted
+							AND activities.category_id IN (%s)
+							%s
+							%s
+					)
+		""" % (
+			Hamsterer.sql_id_list(self.category_ids),
+			self.str_params['SQL_BEG_DATE'],
+			self.str_params['SQL_END_DATE'],
+		)
 
 	def setup_sql_dates(self):
 		self.sql_beg_date = ''
 		self.sql_beg_date_ = ''
 		if self.cli_opts.time_beg:
 			assert(not isinstance(self.cli_opts.time_beg, list))
-			self.sql_params.append(self.cli_opts.time_beg)
+			self.sql_params.append(str(self.cli_opts.time_beg))
 			self.sql_beg_date = "AND facts.start_time >= datetime(?)"
 			self.sql_beg_date_ = (
 				"AND facts.start_time >= datetime('%s')"
 				% (self.cli_opts.time_beg,)
 			)
-		if not Hamsterer.SQL_EXTERNAL:
+		if not self.sql_external:
 			self.str_params['SQL_BEG_DATE'] = self.sql_beg_date
 		else:
 			self.str_params['SQL_BEG_DATE'] = self.sql_beg_date_
@@ -912,91 +1999,71 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		self.sql_end_date_ = ''
 		if self.cli_opts.time_end:
 			assert(not isinstance(self.cli_opts.time_end, list))
-			self.sql_params.append(self.cli_opts.time_end)
+			self.sql_params.append(str(self.cli_opts.time_end))
 			self.sql_end_date = "AND facts.start_time < datetime(?)"
 			self.sql_end_date_ = (
 				"AND facts.start_time < datetime('%s')"
 				% (self.cli_opts.time_end,)
 			)
-		if not Hamsterer.SQL_EXTERNAL:
+		if not self.sql_external:
 			self.str_params['SQL_END_DATE'] = self.sql_end_date
 		else:
 			self.str_params['SQL_END_DATE'] = self.sql_end_date_
 
 	def setup_sql_activities(self):
 		self.sql_activities = ''
-		self.sql_activities_ = ''
-		if self.cli_opts.activities:
-			assert(isinstance(self.cli_opts.activities, list))
-			self.sql_params.append(self.cli_opts.activities)
-			qmark_list = ','.join(['?' for x in self.cli_opts.activities])
-			# We probably don't need/want to be strict:
-			#	self.sql_activities = (
-			#		"AND activities.name in (%s)" % (qmark_list,)
-			#		#"AND activities.search_name in (%s)" % (qmark_list,)
-			#	)
+		if self.activity_ids is not None:
 			self.sql_activities = (
-				"""
-				(0
-					%s
-				)
-				"""
-				% (''.join(["OR activities.name LIKE '%%?%%'"
-							for x in self.cli_opts.activities]),
-				)
-			)
-			# We probably don't need/want to be strict:
-			#name_list = ','.join(["'%s'" % (x,) for x in self.cli_opts.activities])
-			#	self.sql_activities_ = (
-			#		" AND activities.name in (%s)" % (name_list,)
-			#		#" AND activities.search_name in (%s)" % (name_list,)
-			#	)
-			self.sql_activities_ = (
-				"""
-				(0
-					%s
-				)
-				"""
-				% (''.join(["OR activities.name LIKE '%%%s%%'" % (x,)
-							for x in self.cli_opts.activities]),
-				)
+				"facts.activity_id IN (%s)" % (Hamsterer.sql_id_list(self.activity_ids),)
 			)
-		if not Hamsterer.SQL_EXTERNAL:
-			self.str_params['SQL_ACTIVITY_NAME'] = self.sql_activities
-		else:
-			self.str_params['SQL_ACTIVITY_NAME'] = self.sql_activities_
+		self.str_params['SQL_ACTIVITY_NAME'] = self.sql_activities
 
 	def setup_sql_tag_names(self):
 		self.sql_tag_names = ''
-		self.sql_tag_names_ = ''
-		if self.cli_opts.tags:
-			assert(isinstance(self.cli_opts.tags, list))
-			self.sql_params.append(self.cli_opts.tags)
-			qmark_list = ','.join(['?' for x in self.cli_opts.tags])
+		if self.tag_ids is not None:
 			self.sql_tag_names = (
-				"""
-				(0
-					%s
-				)
-				"""
-				% (''.join(["OR tags.name LIKE '%%?%%'"
-							for x in self.cli_opts.tags]),
-				)
+				"fact_tags.tag_id IN (%s)" % (Hamsterer.sql_id_list(self.tag_ids),)
 			)
-			self.sql_tag_names_ = (
-				"""
-				(0
-					%s
-				)
-				"""
-				% (''.join(["OR tags.name LIKE '%%%s%%'" % (x,)
-							for x in self.cli_opts.tags]),
-				)
-			)
-		if not Hamsterer.SQL_EXTERNAL:
-			self.str_params['SQL_TAG_NAMES'] = self.sql_tag_names
+		self.str_params['SQL_TAG_NAMES'] = self.sql_tag_names
+
+	# The activities, categories, and tags tables are tiny next to facts,
+	# so match the -a, -c, and -t names against them once, and filter the
+	# facts by ID (which the facts and fact_tags indexes can look up),
+	# rather than match names on every joined fact row. (The IDs are ours
+	# and not user input, so they're inlined, the same for every sqlite3
+	# mode.)
+
+	def setup_filter_ids(self):
+		# Activity and tag names match loosely (any name containing it);
+		# category names, exactly.
+		self.activity_ids = self.lookup_name_ids('activities', self.cli_opts.activities)
+		self.tag_ids = self.lookup_name_ids('tags', self.cli_opts.tags)
+		self.category_ids = self.lookup_name_ids(
+			'categories', self.cli_opts.categories, exact=True,
+		)
+		log.debug('setup_filter_ids: activities: %s / tags: %s / categories: %s' % (
+			self.activity_ids, self.tag_ids, self.category_ids,
+		))
+
+	def lookup_name_ids(self, table_name, names, exact=False):
+		if not names:
+			return None
+		assert(isinstance(names, list))
+		if exact:
+			name_match = "name = ?"
 		else:
-			self.str_params['SQL_TAG_NAMES'] = self.sql_tag_names_
+			name_match = "name LIKE '%' || ? || '%'"
+		sql_select = "SELECT id FROM %s WHERE %s ORDER BY id" % (
+			table_name, ' OR '.join([name_match for x in names]),
+		)
+		if self.cli_opts.show_sql:
+			log.info(sql_select)
+		return [row[0] for row in self.conn.execute(sql_select, names)]
+
+	@staticmethod
+	def sql_id_list(ids):
+		# SQLite is fine with an empty IN (), which matches nothing.
+		return ','.join([str(int(x)) for x in ids])
 
 	def setup_sql_activities_and_tag_names(self):
 		self.setup_sql_activities()
@@ -1015,43 +2082,158 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			self.str_params['SQL_ACTS_AND_TAGS'] = 'AND (%s)' % (
 				self.str_params['SQL_ACTS_AND_TAGS'],
 			)
+		# The --query search applies on top of (i.e., AND) -a and -t,
+		# so every report that filters by those filters by it, too.
+		self.setup_sql_fact_search()
+		if self.str_params['SQL_FACT_SEARCH']:
+			self.str_params['SQL_ACTS_AND_TAGS'] += ' AND %s' % (
+				self.str_params['SQL_FACT_SEARCH'],
+			)
 
 	def output_reassemble_split_line_comments(self, outlns):
-		outlns_ = []
+		# A generator, so we only ever hold the one row we're still
+		# appending comment lines to, and not the whole result.
+		outln_ = None
 		for outln in outlns:
 			npipes = outln.count('|')
 			#print("npipes: %s" % (npipes,))
 			if npipes == 0:
-				if not outlns_ and not outln:
+				if outln_ is None and not outln:
 					continue
 				if outln:
-					outlns_[-1] = outlns_[-1] + '\\n\\n' + outln
+					if outln_ is None:
+						outln_ = outln
+					else:
+						outln_ = outln_ + '\\n\\n' + outln
 			else:
-				outlns_.append(outln)
-		return outlns_
+				if outln_ is not None:
+					yield outln_
+				outln_ = outln
+		if outln_ is not None:
+			yield outln_
+
+	def output_format_row(self, row):
+		return '|'.join([brief_render.format_value(x) for x in row])
+
+	def output_count_lines(self, outlns):
+		for outln in outlns:
+			self.explain_n_rows += 1
+			yield outln
+
+	def output_print_lines(self, outlns, output_split_days=False):
+		# Write straight to the (buffered) stdout as lines arrive,
+		# rather than print()ing each line.
+		write = sys.stdout.write
+		if self.cli_opts.explain:
+			outlns = self.output_count_lines(outlns)
+		curr_first_col = None
+		last_first_col = None
+		for outln in outlns:
+			if outln:
+				if output_split_days:
+					curr_first_col = outln[:outln.index('|')]
+					#try:
+					#	curr_first_col = outln[:outln.index('|')]
+					#except ValueError:
+					#	curr_first_col = None
+					if ((last_first_col is not None)
+						and (last_first_col != curr_first_col)
+					):
+						write('\n')
+				write(outln)
+				write('\n')
+				last_first_col = curr_first_col
+
+	def output_cursor_lines(self, use_header=False, renderer=None):
+		if use_header:
+			yield '|'.join([col[0] for col in self.curs.description])
+		# Iterating the cursor steps through the results as we print them.
+		if renderer is not None:
+			for outln in renderer.output_lines(self.curs):
+				yield outln
+			return
+		for row in self.curs:
+			for outln in self.output_format_row(row).split('\n'):
+				yield outln
+
+	@staticmethod
+	def output_stream_lines(stream):
+		# Like stream.read().split('\n'), but a line at a time.
+		for outln in stream:
+			if outln.endswith('\n'):
+				outln = outln[:-1]
+			yield outln
+
+	# These are some stderrs [lb's] .sqliterc trigger...
+	RE_LOADING_RESOURCE = re.compile(r'^-- Loading resources from /home/.*/.sqliterc$')
+	RE_ERROR_LIBSPATIALITE = re.compile(
+	r'^Error: near line .*: libspatialite.*: cannot open shared object file: No such file or directory$'
+	)
+
+	def check_sqlite3_stderr(self, errlns):
+		errs_found = False
+		for errln in errlns:
+			if errln and not (
+				Hamsterer.RE_LOADING_RESOURCE.match(errln)
+				or Hamsterer.RE_ERROR_LIBSPATIALITE.match(errln)
+			):
+				errs_found = True
+		if errs_found:
+			print('Errors found!')
+			print(errlns)
+		return errs_found
 
 	def print_output_generic_fcn_name(
 		self,
 		sql_select,
 		use_header=False,
 		output_split_days=False,
+		renderer=None,
 	):
-		errs_found = False
-
 		if self.cli_opts.show_sql:
 			log.info(sql_select)
 
-		if not Hamsterer.SQL_EXTERNAL:
-			log.fatal('sql_select: %s' % (sql_select,))
-			log.fatal('sql_params: %s' % (self.sql_params,))
+		if not self.cli_opts.explain:
+			errs_found = self.print_output_sql_select(
+				sql_select, use_header, output_split_days, renderer,
+			)
+			self.output_errors = self.output_errors or errs_found
+			return errs_found
+
+		what = getattr(self, 'list_type', None) or 'check_integrity'
+		time_0 = self.explain_query_plan(sql_select, what)
+		errs_found = self.print_output_sql_select(
+			sql_select, use_header, output_split_days, renderer,
+		)
+		self.explain_query_timing(time_0, what)
+		return errs_found
+
+	def print_output_sql_select(
+		self,
+		sql_select,
+		use_header=False,
+		output_split_days=False,
+		renderer=None,
+	):
+		errs_found = False
+
+		if not self.sql_external:
 			try:
 				self.curs.execute(sql_select, self.sql_params)
-				print(self.curs.fetchall())
-			except Exception as err:
+				# (The sqlite3 executable, below, prints SQL-formatted
+				# columns, so it has no use for the renderer.)
+				outlns = self.output_cursor_lines(use_header, renderer)
+				outlns = self.output_reassemble_split_line_comments(outlns)
+				self.output_print_lines(outlns, output_split_days)
+			except sqlite3.Error as err:
 				log.fatal('SQL statement failed: %s' % (str(err),))
 				log.fatal('sql_select: %s' % (sql_select,))
 				log.fatal('sql_params: %s' % (self.sql_params,))
+				errs_found = True
 		else:
+			import subprocess
+			import tempfile
+			from hamster_briefs import sqlite_coproc
 			# sqlite3 output options: -column -csv -html -line -list
 			try:
 				sql_args = ['sqlite3',]
@@ -1060,7 +2242,7 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				sql_args += [
 					self.cli_opts.hamster_db_path,
 					#'"%s;"' % (sql_select,),
-					'%s;' % (sql_select,),
+					'%s%s;' % (self.sql_session_setup, sql_select,),
 				]
 				# Send stderr to /dev/null to suppress:
 				#   -- Loading resources from /home/landonb/.sqliterc
@@ -1070,68 +2252,44 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				# with run(), but shell=True dumps me on the sqlite3 prompt.
 				if False:
 					ret = subprocess.run(sql_args, stderr=subprocess.DEVNULL)
-				if LEAK_SQLITE3_ERRORS:
-					# We could use check_output to collect output lines.
-					#ret = subprocess.check_output(sql_args, stderr=subprocess.DEVNULL)
-					# DEBUGGING: Run without stderr redirected.
-					# FIXME: Redirect STDERR so it doesn't print but so can can complain
-					ret = subprocess.check_output(sql_args)
-					ret = ret.decode("utf-8")
-					lines = ret.split('\n')
-					lines = self.output_reassemble_split_line_comments(lines)
-					n_facts = 0
-					for line in lines:
-						if line:
-							print(line)
-							n_facts += 1
-					#print('No. facts found: %d' % (n_facts,))
-				else: # not LEAK_SQLITE3_ERRORS
-					# ret.stdout will be None because everything goes to stdout.
-					#ret = subprocess.run(sql_args, stderr=subprocess.PIPE)
-					# Or we can capture stdout instead and strip that first
-					# blank line.
-					ret = subprocess.run(
-						sql_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-					)
-
-					curr_first_col = None
-					last_first_col = None
-
-					# Process stdout.
-					outlns = ret.stdout.decode("utf-8").split('\n')
-					outlns = self.output_reassemble_split_line_comments(outlns)
-
-					for outln in outlns:
-						if outln:
-							if output_split_days:
-								curr_first_col = outln[:outln.index('|')]
-								#try:
-								#	curr_first_col = outln[:outln.index('|')]
-								#except ValueError:
-								#	curr_first_col = None
-								if ((last_first_col is not None)
-									and (last_first_col != curr_first_col)
-								):
-									print('')
-							print(outln)
-							last_first_col = curr_first_col
-
-					# Process errors.
-					errlns = ret.stderr.decode("utf-8").split('\n')
-					# These are some stderrs [lb's] .sqliterc trigger...
-					re_loading_resource = re.compile(r'^-- Loading resources from /home/.*/.sqliterc$')
-					re_error_libspatialite = re.compile(
-	r'^Error: near line .*: libspatialite.*: cannot open shared object file: No such file or directory$'
+				if self.sql_coprocess is not None:
+					# One long-running sqlite3 for all the queries.
+					try:
+						outlns = self.sql_coprocess.query_lines(sql_select, use_header)
+						outlns = self.output_reassemble_split_line_comments(outlns)
+						self.output_print_lines(outlns, output_split_days)
+					except sqlite_coproc.Sqlite3_Coprocess_Error as err:
+						log.fatal('Sql no bueno: %s' % (sql_select,))
+						log.fatal('sqlite3 failed: %s' % (str(err),))
+						errs_found = True
+					else:
+						errs_found = self.check_sqlite3_stderr(self.sql_coprocess.errlns)
+					return errs_found
+				# Read stdout as sqlite3 writes it, rather than waiting for
+				# it to exit and decoding everything at once. Spool stderr to
+				# a temp file, so a chatty stderr cannot fill its pipe and
+				# block sqlite3 while we're reading stdout.
+				# DEBUGGING: Set LEAK_SQLITE3_ERRORS to run without stderr
+				#            redirected.
+				with tempfile.TemporaryFile() as errs_f:
+					proc = subprocess.Popen(
+						sql_args,
+						stdout=subprocess.PIPE,
+						stderr=None if LEAK_SQLITE3_ERRORS else errs_f,
 					)
-					for errln in errlns:
-						if errln and not (
-							re_loading_resource.match(errln)
-							or re_error_libspatialite.match(errln)
-						):
-							errs_found = True
-					if errs_found:
-						print('Errors found!')
-						print(errlns)
+					with io.TextIOWrapper(proc.stdout, encoding='utf-8', newline='\n') as outs:
+						outlns = Hamsterer.output_stream_lines(outs)
+						outlns = self.output_reassemble_split_line_comments(outlns)
+						self.output_print_lines(outlns, output_split_days)
+					proc.wait()
+					if LEAK_SQLITE3_ERRORS:
+						if proc.returncode:
+							raise subprocess.CalledProcessError(proc.returncode, sql_args)
+					else:
+						# Process errors.
+						errs_f.seek(0)
+						errlns = errs_f.read().decode("utf-8").split('\n')
+						errs_found = self.check_sqlite3_stderr(errlns)
 			except subprocess.CalledProcessError as err:
 				log.fatal('Sql no bueno: %s' % (sql_select,))
 				# Why isn't this printing by itself?
@@ -1143,30 +2301,37 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 	def setup_sql_setup(self):
 		self.sql_params = []
 		self.str_params = {}
-		self.str_params['SQL_CATEGORY_FMTS'] = Hamsterer.SQL_CATEGORY_FMTS
-		self.str_params['SQL_ACTIVITY_FMTS'] = Hamsterer.SQL_ACTIVITY_FMTS
+		self.setup_sql_report_columns()
 
 	def list_all(self):
 		self.setup_sql_setup()
 		self.setup_sql_day_of_week()
+		self.setup_sql_week_starts()
+		self.setup_sql_calendar()
 		self.setup_sql_categories()
 		self.setup_sql_dates()
 		self.setup_sql_activities_and_tag_names()
+		self.str_params['SQL_ENDED_SECONDS'] = (
+			Hamsterer.SQL_SECONDS_UNIXEPOCH if self.sql_unixepoch()
+			else Hamsterer.SQL_SECONDS_JULIANDAY
+		) % ("facts.end_time",)
+		self.str_params['SQL_ENDED_HOURS'] = Hamsterer.SQL_HOURS % {
+			'seconds': self.str_params['SQL_ENDED_SECONDS'],
+		}
 		sql_select = """
 			SELECT
 				%(SQL_DAY_OF_WEEK)s
-				, strftime('%%Y-%%m-%%d', facts.start_time)
+				, calendar.day
 				, strftime('%%H:%%M', facts.start_time)
 				, strftime('%%H:%%M', facts.end_time)
-				, substr(' ' || printf('%%.3f',
-					24.0 * (julianday(facts.end_time) - julianday(facts.start_time))
-					), -10, 10)
+				, substr(' ' || %(SQL_ENDED_HOURS)s, -10, 10)
 				AS duration
 				, activities.name AS activity_name
 				, tags.name
 				, facts.description
 				--, strftime('%%Y-%%j', facts.start_time) AS yrjul
 			FROM facts
+			JOIN temp.calendar ON (calendar.day = date(facts.start_time))
 			JOIN activities ON (activities.id = facts.activity_id)
 			JOIN categories ON (categories.id = activities.category_id)
 			LEFT OUTER JOIN fact_tags ON (facts.id = fact_tags.fact_id)
@@ -1187,46 +2352,273 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		# =================================================================
 		self.print_output_generic_fcn_name(sql_select)
 
-	def setup_sql_fact_durations(self):
+	DAY_OF_WEEK_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat',)
+
+	# NOTE: --gaps and --overlaps check every fact in the -b/-e window,
+	#       ignoring -a/-t/-c and --query, since another category's fact
+	#       fills a gap just the same.
+	def sweep_fact_rows(self):
 		self.setup_sql_setup()
-		self.setup_sql_day_of_week()
-		self.setup_sql_week_starts()
-		self.setup_sql_categories()
 		self.setup_sql_dates()
-		self.setup_sql_activities_and_tag_names()
-		# Note: julianday returns a float, so multiple by units you want,
-		#       *24 gives you hours, or *86400 gives you seconds.
-		# Note: The current activity's end_time is NULL, so put in NOW.
-		# Note: To avoid overlapping rows (bad data), an inner select
-		#       figures out the max facts.id
-		self.sql_fact_durations = """
+		sql_select = """
 			SELECT
-				--strftime('%%Y-%%m-%%d', facts.start_time) AS yrjul
-				strftime('%%Y-%%j', facts.start_time) AS yrjul
-				, CAST(strftime('%%w', facts.start_time) AS integer) AS day_of_week
-				--, CAST(julianday(start_time) AS integer) AS julian_day_group
-				, CASE WHEN (CAST(strftime('%%w', facts.start_time) AS integer) - %(SQL_WEEK_STARTS)s) >= 0
-				  THEN (CAST(strftime('%%w', facts.start_time) AS integer) - %(SQL_WEEK_STARTS)s)
-				  ELSE (7 - %(SQL_WEEK_STARTS)s + CAST(strftime('%%w', facts.start_time) AS integer))
-				  END AS pseudo_week_offset
+				facts.id
 				, facts.start_time
-				, CASE WHEN facts.end_time IS NOT NULL
-				  THEN 24.0 * (julianday(facts.end_time) - julianday(facts.start_time))
-				  ELSE 24.0 * (julianday('now', 'localtime') - julianday(facts.start_time))
-				  END AS duration
-				, categories.name AS category_name
-				--, categories.search_name AS category_name
-				, activities.name AS activity_name
-				--, activities.search_name AS activity_name
-				, facts.activity_id
-				, facts.id AS fact_id
-				--, tag_names
-				, group_concat(DISTINCT tag_names) AS tag_names
-				, facts.description
-			--FROM facts
-			FROM (
+				, IFNULL(facts.end_time, datetime('now', 'localtime'))
+				, julianday(facts.start_time)
+				, julianday(IFNULL(facts.end_time, datetime('now', 'localtime')))
+			FROM facts
+			WHERE NOT facts.deleted
+				%s
+				%s
+			ORDER BY facts.start_time, facts.id
+		""" % (self.sql_beg_date, self.sql_end_date,)
+		if self.cli_opts.show_sql:
+			log.info(sql_select)
+		# We use our own connection's cursor (even for --sqlite3 external),
+		# and we iterate it, rather than fetchall, so memory stays flat.
+		curs = self.conn.cursor()
+		try:
+			if self.cli_opts.explain:
+				from hamster_briefs import index_advisor
+				print('-- QUERY PLAN [%s]' % (self.list_type,))
+				for outln in index_advisor.format_query_plan(
+					index_advisor.query_plan_depths(curs.execute(
+						"EXPLAIN QUERY PLAN %s" % (sql_select,), self.sql_params,
+					).fetchall())
+				):
+					print('-- %s' % (outln,))
+			curs.execute(sql_select, self.sql_params)
+		except sqlite3.Error as err:
+			log.fatal('SQL statement failed: %s' % (str(err),))
+			log.fatal('sql_select: %s' % (sql_select,))
+			log.fatal('sql_params: %s' % (self.sql_params,))
+			self.output_errors = True
+			return
+		for fact_row in curs:
+			self.explain_n_rows += 1
+			yield fact_row
+
+	def list_sweep_report(self, header, header_cols, header_dash, keep_kinds):
+		from hamster_briefs import fact_sweep
+		print()
+		header = '%s [%s]' % (header, self.list_type,)
+		print(header)
+		print('=' * len(header))
+		print(header_cols)
+		print(header_dash)
+		self.explain_n_rows = 0
+		time_0 = time.perf_counter()
+		min_gap_days = self.cli_opts.gap_minutes / (24.0 * 60.0)
+		for (kind, latest, fact_row, days) in fact_sweep.sweep_facts(
+			self.sweep_fact_rows(), min_gap_days,
+		):
+			if kind in keep_kinds:
+				yield (kind, latest, fact_row, days)
+		if self.cli_opts.explain:
+			self.explain_query_timing(time_0, self.list_type)
+
+	def list_gaps(self):
+		for (kind, before, after, days) in self.list_sweep_report(
+			'UNTRACKED GAPS',
+			'wkd|start_date|from |until|duration|before_id|after_id',
+			'---|----------|-----|-----|--------|---------|--------',
+			('gap',),
+		):
+			start_date = datetime.datetime.strptime(before[2][:10], '%Y-%m-%d')
+			print('%s|%s|%s|%s|%8.3f|%d|%d' % (
+				Hamsterer.DAY_OF_WEEK_NAMES[int(start_date.strftime('%w'))],
+				before[2][:10],
+				before[2][11:16],
+				after[1][11:16],
+				24.0 * days,
+				before[0],
+				after[0],
+			))
+
+	def list_overlaps(self):
+		for (kind, latest, fact_row, days) in self.list_sweep_report(
+			'OVERLAPPING FACTS',
+			'wkd|start_date|from |until|duration|fact_id|other_id|overlap',
+			'---|----------|-----|-----|--------|-------|--------|---------',
+			('overlap', 'duplicate',),
+		):
+			start_date = datetime.datetime.strptime(fact_row[1][:10], '%Y-%m-%d')
+			until_time = min(fact_row[2], latest[2])
+			print('%s|%s|%s|%s|%8.3f|%d|%d|%s' % (
+				Hamsterer.DAY_OF_WEEK_NAMES[int(start_date.strftime('%w'))],
+				fact_row[1][:10],
+				fact_row[1][11:16],
+				until_time[11:16],
+				24.0 * days,
+				fact_row[0],
+				latest[0],
+				kind,
+			))
+
+	# One row per day, from New Year's Day of the first fact's year through
+	# today (or the last fact's day, if later), with the date math the
+	# reports group by, so the reports join it once per fact rather than
+	# call strftime() and julianday() on every fact (and again on every
+	# row of every report). The week numbers are julianweeks, as ever:
+	# satsun_week counts Sun-Sat weeks since 1977-01-01 (a Saturday), and
+	# sprint_week counts weeks that start on -w since 1997-01-01 (the
+	# reports subtract -W). Fixed epochs, so backdating a fact does not
+	# renumber every week.
+	# NOTE: SQLite's integer division truncates toward zero, so add (and
+	#       then take back) a million weeks, so weeks before the epochs
+	#       floor to negative numbers, rather than two weeks sharing week 0.
+	# LATER/#XXX: Add clock time to stamp for self.cli_opts.day_starts
+	CALENDAR_TABLE = 'calendar'
+
+	SQL_CALENDAR_CREATE = """
+		CREATE TEMP TABLE %(CALENDAR_TABLE)s (
+			day TEXT PRIMARY KEY
+			, yrjul TEXT
+			, day_of_week INTEGER
+			, day_name TEXT
+			, pseudo_week_offset INTEGER
+			, week_start TEXT
+			, satsun_week INTEGER
+			, sprint_week INTEGER
+			, month TEXT
+		)
+	"""
+
+	SQL_CALENDAR_FILL = """
+		INSERT INTO temp.%(CALENDAR_TABLE)s
+		WITH RECURSIVE
+			bounds (first_day, first_day_of_week, first_day_num, last_day) AS (
 				SELECT
-					max(facts.id) AS max_id
+					first_day
+					, CAST(strftime('%%w', first_day) AS integer)
+					, CAST(julianday(first_day) - julianday('1977-01-01') AS integer)
+					, last_day
+				FROM (
+					SELECT
+						strftime('%%Y-01-01', min(start_time)) AS first_day
+						, max(date(max(start_time)), date('now', 'localtime')) AS last_day
+					FROM facts
+				)
+			),
+			days (day, day_num, day_of_week) AS (
+				SELECT first_day, first_day_num, first_day_of_week
+				FROM bounds
+				WHERE first_day IS NOT NULL
+				UNION ALL
+				SELECT date(day, '+1 day'), day_num + 1, (day_of_week + 1) %% 7
+				FROM days, bounds
+				WHERE day < last_day
+			),
+			weeks (day, day_num, day_of_week, pseudo_week_offset) AS (
+				SELECT
+					day
+					, day_num
+					, day_of_week
+					, (day_of_week - %(SQL_WEEK_STARTS)s + 7) %% 7
+				FROM days
+			)
+		SELECT
+			day
+			, strftime('%%Y-%%j', day)
+			, day_of_week
+			, substr('sunmontuewedthufrisat', 1 + 3 * day_of_week, 3)
+			, pseudo_week_offset
+			, date(day, '-' || pseudo_week_offset || ' days')
+			, (day_num + 6 + 7000000) / 7 - 1000000
+			, (
+				day_num - %(DAYS_1977_TO_1997)s - pseudo_week_offset + 7 + 7000000
+			) / 7 - 1000000
+			, substr(day, 1, 7)
+		FROM weeks
+	"""
+
+	@staticmethod
+	def sql_calendar_stmts(week_starts):
+		str_params = {
+			'CALENDAR_TABLE': Hamsterer.CALENDAR_TABLE,
+			'SQL_WEEK_STARTS': int(week_starts),
+			# julianday('1997-01-01') - julianday('1977-01-01')
+			'DAYS_1977_TO_1997': 7305,
+		}
+		return [
+			"DROP TABLE IF EXISTS temp.%(CALENDAR_TABLE)s" % str_params,
+			Hamsterer.SQL_CALENDAR_CREATE % str_params,
+			Hamsterer.SQL_CALENDAR_FILL % str_params,
+		]
+
+	def setup_sql_calendar(self):
+		# Once per connection, but the sqlite3 subprocess path opens a new
+		# session per report, so it runs the statements before each report.
+		if self.calendar_ready:
+			return
+		sql_stmts = Hamsterer.sql_calendar_stmts(self.cli_opts.week_starts)
+		if self.cli_opts.show_sql:
+			log.info(';\n'.join(sql_stmts))
+		if not self.sql_external:
+			for sql_stmt in sql_stmts:
+				self.conn.execute(sql_stmt)
+			# NOTE: The INSERT opened a transaction (Python's sqlite3 does
+			#       that for us), which, until we end it, holds a SHARED lock
+			#       on hamster.db, so hamster cannot write, and (for --follow)
+			#       PRAGMA data_version never sees anyone else's writes.
+			self.conn.commit()
+		elif self.sql_coprocess is not None:
+			errlns = self.sql_coprocess.execute(';\n'.join(sql_stmts))
+			if self.check_sqlite3_stderr(errlns):
+				log.fatal('sql_calendar: %s' % (';\n'.join(sql_stmts),))
+				sys.exit(1)
+		else:
+			self.sql_session_setup = ''.join(['%s;\n' % (x,) for x in sql_stmts])
+		self.calendar_ready = True
+
+	# Note: The durations are whole seconds (integers, so the sums are
+	#       exact); SQL_DURATION et al. format them as hours.
+	# Note: The current activity's end_time is NULL, so put in NOW.
+	# Note: The date columns come from the calendar (see SQL_CALENDAR_FILL).
+	# Note: To avoid overlapping rows (bad data), an inner select
+	#       figures out the max facts.id (see SQL_NEWEST_FACTS).
+	SQL_FACT_DURATIONS = """
+		SELECT
+			calendar.yrjul
+			, calendar.day_of_week
+			, calendar.day_name
+			, calendar.pseudo_week_offset
+			, calendar.week_start
+			, calendar.satsun_week
+			, calendar.sprint_week
+			, facts.start_time
+			, CASE WHEN facts.end_time IS NOT NULL
+			  THEN %(SQL_ENDED_SECONDS)s
+			  ELSE %(SQL_OPEN_SECONDS)s
+			  END AS duration
+			, categories.name AS category_name
+			--, categories.search_name AS category_name
+			, activities.name AS activity_name
+			--, activities.search_name AS activity_name
+			, facts.activity_id
+			, facts.id AS fact_id
+			, newest.tag_names
+			, facts.description
+		--FROM facts
+		FROM (%(SQL_NEWEST_FACTS)s) AS newest
+		JOIN facts ON (newest.fact_id = facts.id)
+		JOIN temp.calendar ON (calendar.day = date(facts.start_time))
+		JOIN activities ON (activities.id = facts.activity_id)
+		JOIN categories ON (categories.id = activities.category_id)
+		WHERE 1
+			%(REPORT_CATEGORIES)s
+		ORDER BY facts.start_time
+	"""
+
+	# Each (filtered) fact, and its (filtered) tags.
+	# NOTE: So the tag join, group_concat, and dedupe only see the facts
+	#       we might report, filter by everything we can here (see
+	#       setup_sql_category_start_times for -c).
+	SQL_FACT_TAG_NAMES = """
+				SELECT
+					facts.id AS fact_id
+					, facts.start_time
 					, group_concat(tags.name) AS tag_names
 				FROM facts
 				JOIN activities ON (activities.id = facts.activity_id)
@@ -1235,19 +2627,144 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				WHERE NOT facts.deleted
 					%(SQL_BEG_DATE)s
 					%(SQL_END_DATE)s
+					%(SQL_LIVE_FROM)s
 					%(SQL_ACTS_AND_TAGS)s
-				GROUP BY start_time, tags.id
-			) AS max
-			JOIN facts ON (max.max_id = facts.id)
-			JOIN activities ON (activities.id = facts.activity_id)
-			JOIN categories ON (categories.id = activities.category_id)
-			WHERE 1
-				%(REPORT_CATEGORIES)s
-			GROUP BY facts.id
-			ORDER BY facts.start_time
-		""" % self.str_params
+					%(SQL_CATEGORY_START_TIMES)s
+				GROUP BY facts.id
+	"""
+
+	# Of the facts that start at the same time, keep the newest (hamster
+	# makes a new fact when you edit one). Dedupe a row per fact, not one
+	# per fact and tag (which sorts more rows, and keeps both of two facts
+	# with different tags). Number each start_time's facts with a window
+	# function (SQLite 3.25 and up) ...
+	SQL_NEWEST_FACTS_WINDOW = """
+			SELECT fact_id, tag_names FROM (
+				SELECT
+					fact_id
+					, tag_names
+					, ROW_NUMBER() OVER (
+						PARTITION BY start_time ORDER BY fact_id DESC
+					) AS start_time_nth
+				FROM (%(SQL_FACT_TAG_NAMES)s)
+			)
+			WHERE start_time_nth = 1
+	"""
+
+	# ... or, on older SQLites, group them. (SQLite fills in the bare
+	# tag_names column from the row that max() picks.)
+	SQL_NEWEST_FACTS_GROUPED = """
+			SELECT max(fact_id) AS fact_id, tag_names
+			FROM (%(SQL_FACT_TAG_NAMES)s)
+			GROUP BY start_time
+	"""
+
+	# The seconds from the fact's start to %s: the difference of their
+	# unixepoch()s (SQLite 3.38 and up), or of their julianday()s, which
+	# (rounded) comes to the same whole seconds, only slower.
+	SQL_SECONDS_UNIXEPOCH = "(unixepoch(%s) - unixepoch(facts.start_time))"
+	SQL_SECONDS_JULIANDAY = (
+		"CAST(round(86400 * (julianday(%s) - julianday(facts.start_time))) AS INTEGER)"
+	)
+
+	def sql_window_functions(self):
+		return self.sql_caps.window_functions
+
+	def sql_unixepoch(self):
+		return self.sql_caps.unixepoch
+
+	@staticmethod
+	def sql_fact_durations_format(str_params, window_functions, unixepoch=False):
+		if window_functions:
+			sql_newest_facts = Hamsterer.SQL_NEWEST_FACTS_WINDOW
+		else:
+			sql_newest_facts = Hamsterer.SQL_NEWEST_FACTS_GROUPED
+		if unixepoch:
+			sql_seconds = Hamsterer.SQL_SECONDS_UNIXEPOCH
+		else:
+			sql_seconds = Hamsterer.SQL_SECONDS_JULIANDAY
+		str_params = dict(str_params)
+		str_params['SQL_ENDED_SECONDS'] = sql_seconds % ("facts.end_time",)
+		str_params['SQL_OPEN_SECONDS'] = sql_seconds % ("'now', 'localtime'",)
+		str_params['SQL_FACT_TAG_NAMES'] = Hamsterer.SQL_FACT_TAG_NAMES % str_params
+		str_params['SQL_NEWEST_FACTS'] = sql_newest_facts % str_params
+		return Hamsterer.SQL_FACT_DURATIONS % str_params
+
+	def setup_sql_fact_durations(self, materialize=True):
+		self.setup_sql_setup()
+		self.setup_sql_day_of_week()
+		self.setup_sql_week_starts()
+		self.setup_sql_calendar()
+		# NOTE: The setup_sql_* fcns. append to self.sql_params in the order
+		#       they're called, so call them in the order their '?'s appear
+		#       in the SQL: the inner select's dates, its search, and then
+		#       the -c subquery's dates. (The -a, -t, and -c filters are
+		#       inlined IDs; no '?'s.)
+		self.setup_sql_dates()
+		self.setup_sql_live_from()
+		self.setup_sql_activities_and_tag_names()
+		self.setup_sql_categories()
+		self.setup_sql_category_start_times()
+		self.sql_fact_durations = Hamsterer.sql_fact_durations_format(
+			self.str_params, self.sql_window_functions(), self.sql_unixepoch(),
+		)
 		self.str_params['SQL_FACT_DURATIONS'] = self.sql_fact_durations
-		self.str_params['SQL_DURATION'] = Hamsterer.SQL_DURATION
+		if not materialize:
+			return
+		if (not self.sql_external) or (self.sql_coprocess is not None):
+			self.setup_sql_fact_durations_temp()
+
+	# Every report runs the same filtered fact durations subquery, so run
+	# it once per invocation and have each report read the temp table.
+	# (The sqlite3 subprocess path opens a new session per report, so it
+	# cannot share a temp table and embeds the subquery instead.)
+	FACT_DURATIONS_TABLE = 'fact_durations'
+
+	def setup_sql_fact_durations_temp(self):
+		table_name = Hamsterer.FACT_DURATIONS_TABLE
+		if not self.fact_durations_ready:
+			sql_create = "CREATE TEMP TABLE %s AS %s" % (
+				table_name, self.sql_fact_durations,
+			)
+			if self.cli_opts.show_sql:
+				log.info(sql_create)
+			if self.cli_opts.explain:
+				what = 'temp.%s' % (table_name,)
+				time_0 = self.explain_query_plan(self.sql_fact_durations, what)
+			sql_stmts = [
+				"DROP TABLE IF EXISTS temp.%s" % (table_name,),
+				sql_create,
+				"CREATE INDEX temp.%s_start_time ON %s (start_time)"
+				% (table_name, table_name,),
+				"CREATE INDEX temp.%s_yrjul ON %s (yrjul)"
+				% (table_name, table_name,),
+			]
+			if self.sql_coprocess is None:
+				for sql_stmt in sql_stmts:
+					params = self.sql_params if sql_stmt is sql_create else []
+					self.curs.execute(sql_stmt, params)
+				# Don't keep hamster.db locked (see setup_sql_calendar).
+				self.conn.commit()
+				if self.daily_rollup is not None:
+					self.setup_sql_rollup_days(table_name)
+			else:
+				errlns = self.sql_coprocess.execute(';\n'.join(sql_stmts))
+				if self.check_sqlite3_stderr(errlns):
+					log.fatal('sql_create: %s' % (sql_create,))
+					sys.exit(1)
+			self.fact_durations_ready = True
+			if self.cli_opts.explain:
+				sql_count = "SELECT COUNT(*) FROM temp.%s" % (table_name,)
+				if self.sql_coprocess is None:
+					n_rows = self.conn.execute(sql_count).fetchone()[0]
+				else:
+					n_rows = int(list(self.sql_coprocess.query_lines(sql_count))[0])
+				self.explain_query_timing(time_0, what, n_rows=n_rows)
+		# The filter params were bound when the table was populated.
+		self.sql_params = []
+		self.str_params['SQL_FACT_DURATIONS'] = (
+			"SELECT * FROM temp.%s ORDER BY start_time" % (table_name,)
+		)
 
 	def list_gross_wrap(self, subtitle, cats, acts, tags):
 		print()
@@ -1350,7 +2867,7 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		sql_select = """
 			SELECT
 				%(SQL_DAY_OF_WEEK)s
-				, strftime('%%Y-%%m-%%d', min(julianday(start_time))) AS start_time
+				, date(min(start_time)) AS start_time
 				, %(SQL_DURATION)s as duration
 				%(SELECT_CATEGORIES)s
 				%(SELECT_ACTIVITIES)s
@@ -1359,30 +2876,33 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			%(SQL_GROUP_BY)s
 			ORDER BY start_time, activity_name
 		""" % self.str_params
-		self.print_output_generic_fcn_name(sql_select, output_split_days=self.cli_opts.output_split_days)
-
-	SQL_WEEK_START_JDAY = (
-		"""
-		julianday(start_time)
-		- pseudo_week_offset
-		+ 7
-		"""
-	)
+		if self.print_brief_engine_output(output_split_days=self.cli_opts.output_split_days):
+			return
+		renderer = brief_render.report_renderer(
+			use_categories=(group_by_categories or self.cli_opts.show_cats),
+			group_by_activities=group_by_activities,
+			group_by_facts_tags=group_by_facts_tags,
+			show_tags=self.cli_opts.show_tags,
+		)
+		self.print_output_generic_fcn_name(
+			sql_select,
+			output_split_days=self.cli_opts.output_split_days,
+			renderer=renderer,
+		)
 
 	def list_weekly_wrap(self,
 		group_by_categories=False,
 		group_by_activities=False,
 		group_by_facts_tags=False,
-		sql_julian_day_of_year=None,
+		week_column=None,
 		week_num_unit='sprint_num',
 		gross_wrap=False,
 	):
 		group_bys = []
 		self.setup_sql_fact_durations()
-		if sql_julian_day_of_year:
+		if week_column:
 			self.str_params['SQL_JULIAN_WEEK_INNER'] = (
-				", CAST((%s) / 7 as integer) AS julianweek"
-				% (sql_julian_day_of_year,)
+				", %s AS julianweek" % (week_column,)
 			)
 			self.str_params['FIRST_SPRINT_WEEK_NUM'] = self.cli_opts.first_sprint_week_num
 			self.str_params['WEEK_NUM_UNIT'] = week_num_unit
@@ -1391,14 +2911,10 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				% self.str_params
 			)
 			group_bys.append('julianweek')
-			header_cols = 'wkd|start_date|wk|duration'
-			header_dash = '---|----------|--|--------'
 		else:
 			# Don't group by a time interval.
 			self.str_params['SQL_JULIAN_WEEK_INNER'] = ''
 			self.str_params['SQL_JULIAN_WEEK_OUTER'] = ''
-			header_cols = 'wkd|start_date|duration'
-			header_dash = '---|----------|--------'
 		outer_select_extra = ''
 		inner_select_extra = ''
 		order_bys = ['start_date']
@@ -1406,8 +2922,6 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			group_bys.append('category_name')
 			outer_select_extra += ", %(SQL_CATEGORY_FMTS)s" % self.str_params
 			inner_select_extra += ', category_name'
-			header_cols += '|category_nom'
-			header_dash += '|------------'
 			if gross_wrap:
 				order_bys.insert(0, 'category_name')
 			else:
@@ -1420,8 +2934,6 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				order_bys.insert(0, 'activity_name')
 			else:
 				order_bys.append('activity_name')
-			header_cols += '|activity_nom' + ' ' * (54 - 12 - 1)
-			header_dash += '|' + '-' * (54 - 1)
 		if group_by_facts_tags:
 			outer_select_extra += ', tag_names'
 			#outer_select_extra += ', group_concat(DISTINCT tag_names) AS tag_names'
@@ -1432,8 +2944,6 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 			else:
 				order_bys.append('tag_names')
 			group_bys.append('tag_names')
-			header_cols += '|tag_names'
-			header_dash += '|---------'
 		if self.cli_opts.show_tags and not group_by_facts_tags:
 			outer_select_extra += ', tag_names'
 		#if False: # Something like this?:
@@ -1451,11 +2961,16 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		self.str_params['SQL_GROUP_BY'] = sql_group_by
 		sql_order_by = "ORDER BY %s" % (', '.join(order_bys),) if order_bys else ''
 		self.str_params['SQL_ORDER_BY'] = sql_order_by
-		sql_select = """
+		# Every week starts on the -w day (see setup_sql_day_of_week re: 'sat').
+		self.str_params['SQL_WEEK_DAY_OF_WEEK'] = (
+			"CASE WHEN start_time IS NULL THEN 'sat' ELSE '%s' END AS day_of_week"
+			% (Hamsterer.DAY_OF_WEEK_NAMES[self.cli_opts.week_starts],)
+		)
+		sql_template = """
 			SELECT
-				%(SQL_DAY_OF_WEEK)s
+				%(SQL_WEEK_DAY_OF_WEEK)s
 				-- This might be weekly ordering look funny:
-				, strftime('%%Y-%%m-%%d', start_time) AS start_date
+				, start_time AS start_date
 				-- So maybe try this:
 				--, strftime('%%Y-%%m-%%d', start_week) AS start_date
 				----, julianweek
@@ -1465,8 +2980,8 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				%(OUTER_EXTRA)s
 			FROM (
 				SELECT
-					min(julianday(start_time)) AS real_start_time
-					, julianday(start_time) - pseudo_week_offset AS start_time
+					min(start_time) AS real_start_time
+					, week_start AS start_time
 					%(SQL_JULIAN_WEEK_INNER)s
 					, %(SQL_DURATION)s AS duration
 					--, tag_names
@@ -1476,31 +2991,32 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 				%(SQL_GROUP_BY)s
 			) AS project_time
 			%(SQL_ORDER_BY)s
-			""" % self.str_params
+			"""
+		sql_select = sql_template % self.str_params
 		##self.print_output_generic_fcn_name(sql_select, use_header=True)
-		#print('wkd|start_date|w|duration|category_nom|activitiy_name|tag_names')
-		#print('---|----------|-|--------|------------|--------------|---------')
-		print(header_cols)
-		print(header_dash)
+		renderer = brief_render.report_renderer(
+			use_week_num=bool(week_column),
+			use_categories=(group_by_categories or self.cli_opts.show_cats),
+			group_by_activities=group_by_activities,
+			group_by_facts_tags=group_by_facts_tags,
+			show_tags=self.cli_opts.show_tags,
+		)
+		for header_line in renderer.header_lines():
+			print(header_line)
 		#      tue|2016-02-09|6|   0.167|    personal|Bathroom|
-		self.print_output_generic_fcn_name(sql_select, use_header=False)
-
-	# FIXME/2018-07-31: Get the year from cli_opts, so from first fact in store.
-	SQL_WEEK_START_DNUM_SATSUN = (
-		# LATER/#XXX: Add clock time to stamp for self.cli_opts.day_starts
-
-		# FIXME/2018-07-31: Get the year from cli_opts, so from first fact in store.
-		#"""
-		#julianday(start_time)
-		#- julianday(strftime('%Y-01-01', start_time))
-		#+ CAST(strftime('%w', strftime('%Y-01-01', start_time)) AS integer)
-		#"""
-		"""
-		julianday(start_time)
-		- julianday(strftime('1977-01-01'))
-		+ CAST(strftime('%w', strftime('1977-01-01')) AS integer)
-		"""
-	)
+		if self.union_branches is not None:
+			# See list_union_reports: read the fact grain, not the facts.
+			sql_select = sql_template % dict(
+				self.str_params, SQL_FACT_DURATIONS="SELECT * FROM fact_grain",
+			)
+			group_bys = list(group_bys)
+			if week_column:
+				group_bys.append(week_column)
+			self.union_branches.append((sql_select, renderer, group_bys,))
+			return
+		if self.print_brief_engine_output():
+			return
+		self.print_output_generic_fcn_name(sql_select, use_header=False, renderer=renderer)
 
 	def list_satsun_weekly_wrap(self, subtitle, cats, acts, tags):
 		print()
@@ -1509,12 +3025,11 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		print('=' * len(header))
 		#print('===============================================================')
 		# =================================================================
-		sql_julian_day_of_year = Hamsterer.SQL_WEEK_START_DNUM_SATSUN
 		self.list_weekly_wrap(
 			group_by_categories=cats,
 			group_by_activities=acts,
 			group_by_facts_tags=tags,
-			sql_julian_day_of_year=sql_julian_day_of_year,
+			week_column='satsun_week',
 			week_num_unit='week_num'
 		)
 
@@ -1533,13 +3048,6 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 	def list_satsun_weekly_totals(self):
 		self.list_satsun_weekly_wrap('TOTAL', False, False, False)
 
-	SQL_WEEK_START_DNUM_SPRINT = (
-		# FIXME/2018-07-31: Get the year from cli_opts, so from first fact in store.
-		#"%s - julianday(strftime('%%Y-01-01', start_time))"
-		"%s - julianday(strftime('1997-01-01'))"
-		% (SQL_WEEK_START_JDAY,)
-	)
-
 	def list_sprint_weekly_wrap(self, subtitle, cats, acts, tags):
 		print()
 		header = 'SPRINT WEEKLY %s TOTALS [%s]' % (subtitle, self.list_type,)
@@ -1547,12 +3055,11 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		print('=' * len(header))
 		#print('===============================================================')
 		# =================================================================
-		sql_julian_day_of_year = Hamsterer.SQL_WEEK_START_DNUM_SPRINT
 		self.list_weekly_wrap(
 			group_by_categories=cats,
 			group_by_activities=acts,
 			group_by_facts_tags=tags,
-			sql_julian_day_of_year=sql_julian_day_of_year,
+			week_column='sprint_week',
 			week_num_unit='sprint_num'
 		)
 
@@ -1585,7 +3092,7 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 		sql_select = """
 			SELECT
 				  fact_day
-				, SUM(duration) AS duration
+				, SUM(duration) / 3600.0 AS duration
 				, category_name
 				, activity_name
 				, activity_id
@@ -1609,8 +3116,8 @@ class Hamsterer(pyoiler_argparse.Simple_Script_Base):
 					--	WHEN description IS NULL THEN '"Misc. [' || duration || ']"'
 					--	ELSE '"' || description || ' [' || duration || ']"'
 					, CASE
-						WHEN description IS NULL THEN '"Misc.","' || duration || '"'
-						ELSE '"' || description || '","' || duration || '"'
+						WHEN description IS NULL THEN '"Misc.","' || (duration / 3600.0) || '"'
+						ELSE '"' || description || '","' || (duration / 3600.0) || '"'
 					END AS desc_and_durn
 				FROM (%(SQL_FACT_DURATIONS)s) AS project_time
 			)
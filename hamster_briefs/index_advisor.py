@@ -0,0 +1,233 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Indexes that make the hamster-briefs report SQL fast.
+
+The stock hamster (and dob) schema only indexes the primary keys,
+so every report scans the whole facts table to find its date range,
+and looks up fact_tags without an index.
+
+CAREFUL: SQLite refuses to open a database whose schema uses features
+it doesn't know, so if other (older) programs open your hamster.db,
+note that partial indexes need SQLite 3.8.0, and indexes on expressions
+need SQLite 3.9.0. (Run DROP INDEX to undo.)
+"""
+
+import re
+import sqlite3
+
+class Index_Spec(object):
+
+	def __init__(self, name, table, columns, where=None, reason='', min_sqlite=(3, 8, 0)):
+		self.name = name
+		self.table = table
+		self.columns = columns
+		self.where = where
+		self.reason = reason
+		self.min_sqlite = min_sqlite
+
+	def create_sql(self):
+		sql_create = "CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (
+			self.name, self.table, ', '.join(self.columns),
+		)
+		if self.where:
+			sql_create += " WHERE %s" % (self.where,)
+		return sql_create
+
+	def is_expression(self):
+		return [x for x in self.columns if '(' in x]
+
+	def supported(self, sqlite_version_info=sqlite3.sqlite_version_info):
+		return tuple(sqlite_version_info) >= self.min_sqlite
+
+# What the generated report SQL filters, joins, and groups on.
+REPORT_INDEXES = [
+	Index_Spec(
+		'hamster_briefs_facts_start_time',
+		'facts',
+		['start_time',],
+		where='NOT deleted',
+		reason="Range scans for -b/-e/-0/-1/etc.: "
+			"NOT facts.deleted AND facts.start_time >= ? AND facts.start_time < ?",
+	),
+	Index_Spec(
+		'hamster_briefs_facts_open',
+		'facts',
+		['end_time',],
+		where='end_time IS NULL',
+		reason="The open fact (check_integrity): end_time IS NULL AND NOT deleted",
+	),
+	Index_Spec(
+		'hamster_briefs_facts_activity_id',
+		'facts',
+		['activity_id', 'start_time',],
+		reason="-a filters: facts.activity_id IN (...)",
+	),
+	Index_Spec(
+		'hamster_briefs_fact_tags_fact_id',
+		'fact_tags',
+		['fact_id', 'tag_id',],
+		reason="Tag joins: facts.id = fact_tags.fact_id",
+	),
+	Index_Spec(
+		'hamster_briefs_fact_tags_tag_id',
+		'fact_tags',
+		['tag_id', 'fact_id',],
+		reason="-t filters: fact_tags.tag_id IN (...)",
+	),
+	Index_Spec(
+		'hamster_briefs_facts_yrjul',
+		'facts',
+		["strftime('%Y-%j', start_time)",],
+		where='NOT deleted',
+		reason="Daily rollups: GROUP BY strftime('%Y-%j', start_time)",
+		min_sqlite=(3, 9, 0),
+	),
+]
+
+def normalize_sql(sql):
+	# Compare SQL ignoring case, whitespace, and facts./fact_tags. prefixes.
+	sql = re.sub(r'\s+', '', (sql or '').lower())
+	return re.sub(r'\b(facts|fact_tags)\.', '', sql)
+
+def table_indexes(conn, table):
+	"""Return [(index_name, [key column names], index_sql, where_sql)].
+
+	(Expression columns have no name, so they're None in the list.)
+	"""
+	indexes = []
+	curs = conn.cursor()
+	for index_row in curs.execute("PRAGMA index_list(%s)" % (table,)).fetchall():
+		index_name = index_row[1]
+		xinfo = conn.execute("PRAGMA index_xinfo(%s)" % (index_name,)).fetchall()
+		index_cols = [
+			col_name for (seqno, cid, col_name, desc, coll, key) in xinfo if key
+		]
+		index_sql = conn.execute(
+			"SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+			(index_name,)
+		).fetchone()
+		index_sql = index_sql[0] if index_sql else None
+		where_sql = None
+		if index_sql:
+			where_match = re.search(r'\bwhere\b(.*)$', index_sql, re.IGNORECASE | re.DOTALL)
+			if where_match:
+				where_sql = where_match.group(1)
+		indexes.append((index_name, index_cols, index_sql, where_sql,))
+	return indexes
+
+def find_satisfying_index(conn, spec):
+	"""Return the name of an existing index that serves spec, or None.
+
+	A full index serves a partial one; otherwise the WHERE must match.
+	For plain columns, the existing index's leading column must match;
+	for expressions, the index's SQL must contain the expression.
+	"""
+	for (index_name, index_cols, index_sql, where_sql) in table_indexes(conn, spec.table):
+		if where_sql and (normalize_sql(where_sql) != normalize_sql(spec.where)):
+			continue
+		if spec.is_expression():
+			if (
+				index_sql
+				and (normalize_sql(spec.columns[0]) in normalize_sql(index_sql))
+			):
+				return index_name
+		elif index_cols and (index_cols[0] == spec.columns[0]):
+			return index_name
+	return None
+
+def table_exists(conn, table):
+	return conn.execute(
+		"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+	).fetchone() is not None
+
+def advise_indexes(conn, specs=REPORT_INDEXES):
+	"""Return [(spec, existing_index_name_or_None)] for specs that apply."""
+	advice = []
+	for spec in specs:
+		if not table_exists(conn, spec.table):
+			continue
+		advice.append((spec, find_satisfying_index(conn, spec),))
+	return advice
+
+def ensure_indexes(conn, specs=REPORT_INDEXES, sqlite_version_info=sqlite3.sqlite_version_info):
+	"""Create the missing indexes, then ANALYZE. Returns the specs created."""
+	created = []
+	for (spec, existing) in advise_indexes(conn, specs):
+		if existing or not spec.supported(sqlite_version_info):
+			continue
+		conn.execute(spec.create_sql())
+		created.append(spec)
+	conn.execute("ANALYZE")
+	conn.commit()
+	return created
+
+# Query plan steps worth a second look.
+RE_PLAN_SUBQUERY = re.compile(r'^(MATERIALIZE|CO-ROUTINE) (\S+)')
+RE_PLAN_SCAN = re.compile(r'^SCAN (TABLE |SUBQUERY )?(\S+)')
+
+def plan_warning(detail, subqueries=()):
+	"""Return why a plan step is expensive, or None.
+
+	Scans of the subqueries the plan already materialized are expected.
+	"""
+	scan_match = RE_PLAN_SCAN.match(detail)
+	if scan_match:
+		if (scan_match.group(1) == 'SUBQUERY ') or (scan_match.group(2) in subqueries):
+			return None
+		if ' USING ' in detail:
+			return 'full index scan'
+		return 'full table scan'
+	if detail.startswith('USE TEMP B-TREE'):
+		return 'temp b-tree'
+	if detail.startswith('CORRELATED '):
+		return 'runs once per outer row'
+	if ' AUTOMATIC ' in detail:
+		return 'index built per query'
+	return None
+
+def parse_plan_lines(outlns):
+	"""Return [(depth, detail)] from the sqlite3 shell's EXPLAIN QUERY PLAN.
+
+	Newer shells draw a tree (|--, `--); older ones print flat rows,
+	selectid|order|from|detail, which we show flat.
+	"""
+	plan_steps = []
+	for outln in outlns:
+		if (not outln) or (outln == 'QUERY PLAN'):
+			continue
+		tree_match = re.match(r'^([|` ]*[|`]--)(.*)$', outln)
+		if tree_match:
+			depth = (len(tree_match.group(1)) - 3) // 3
+			plan_steps.append((depth, tree_match.group(2),))
+			continue
+		row_match = re.match(r'^\d+\|\d+\|\d+\|(.*)$', outln)
+		plan_steps.append((0, row_match.group(1) if row_match else outln,))
+	return plan_steps
+
+def query_plan_depths(plan_rows):
+	"""Return [(depth, detail)] for the (id, parent, notused, detail) rows."""
+	depths = {}
+	plan_steps = []
+	for plan_row in plan_rows:
+		(step_id, parent_id, detail) = (plan_row[0], plan_row[1], plan_row[-1])
+		depth = depths[parent_id] + 1 if parent_id in depths else 0
+		depths[step_id] = depth
+		plan_steps.append((depth, detail,))
+	return plan_steps
+
+def format_query_plan(plan_steps):
+	"""Return the [(depth, detail)] plan as indented lines, with warnings."""
+	outlns = []
+	subqueries = set()
+	for (depth, detail) in plan_steps:
+		subquery_match = RE_PLAN_SUBQUERY.match(detail)
+		if subquery_match:
+			subqueries.add(subquery_match.group(2))
+		outln = '%s%s' % ('   ' * depth, detail,)
+		warning = plan_warning(detail, subqueries)
+		if warning:
+			outln = '%-60s <-- %s' % (outln, warning,)
+		outlns.append(outln)
+	return outlns
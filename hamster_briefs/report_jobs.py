@@ -0,0 +1,59 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""Run reports in parallel (--jobs), each worker process on its own connection.
+
+Each worker opens hamster.db read-only, builds its own fact durations
+temp table (once, for whichever report it runs first), and returns each
+report's output, which the parent prints in the order it was asked for.
+"""
+
+import concurrent.futures
+import contextlib
+import io
+import os
+import sqlite3
+import urllib.parse
+
+# The Hamsterer that runs this worker process's reports.
+worker_script = None
+
+def default_jobs():
+	return os.cpu_count() or 1
+
+def connect_read_only(db_path):
+	return sqlite3.connect(
+		'file:%s?mode=ro' % (urllib.parse.quote(os.path.realpath(db_path)),),
+		uri=True,
+	)
+
+def init_worker(script_class, cli_opts, rollup_path, live_from):
+	global worker_script
+	worker_script = script_class()
+	worker_script.setup_report_job(cli_opts, rollup_path, live_from)
+
+def run_report(list_type):
+	"""Return the report's output, and whether it logged SQL errors."""
+	outs = io.StringIO()
+	worker_script.output_errors = False
+	with contextlib.redirect_stdout(outs):
+		worker_script.list_type = list_type
+		worker_script.process_list_type(list_type)
+	return (outs.getvalue(), worker_script.output_errors,)
+
+class Report_Pool(object):
+
+	def __init__(self, script_class, n_jobs, cli_opts, rollup_path=None, live_from=None):
+		# script_class is the Hamsterer class (which imports us).
+		self.executor = concurrent.futures.ProcessPoolExecutor(
+			max_workers=n_jobs,
+			initializer=init_worker,
+			initargs=(script_class, cli_opts, rollup_path, live_from,),
+		)
+
+	def submit(self, list_type):
+		return self.executor.submit(run_report, list_type)
+
+	def close(self):
+		self.executor.shutdown()
@@ -0,0 +1,152 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""A cache of report output, so repeat runs needn't open hamster.db.
+
+Each entry is the stdout of one run, in a file named by the hash of
+the report options and the state of hamster.db (its size, mtime, and
+inode, and those of its -wal file, if any). Any write to hamster.db
+changes its state, so stale entries are never found; they just age
+out. The cache is trimmed to size, least recently used first (a hit
+touches the file's mtime).
+"""
+
+import collections
+import os
+
+DEFAULT_CACHE_BYTES = 16 * 1024 * 1024
+
+def default_cache_dir():
+	cache_home = (
+		os.environ.get('XDG_CACHE_HOME')
+		or os.path.join(os.path.expanduser('~'), '.cache')
+	)
+	return os.path.join(cache_home, 'hamster-briefs')
+
+def db_state_token(db_path):
+	"""Return what changes whenever hamster.db does, without opening it."""
+	token = []
+	for path in (db_path, '%s-wal' % (db_path,),):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			token.append(None)
+			continue
+		token.append((stat.st_size, stat.st_mtime_ns, stat.st_ino,))
+	return token
+
+class Output_Tee(object):
+	"""Pass writes through to stream, and keep a copy (up to max_chars)."""
+
+	def __init__(self, stream, max_chars):
+		self.stream = stream
+		self.max_chars = max_chars
+		self.n_chars = 0
+		self.chunks = []
+
+	def write(self, text):
+		if self.chunks is not None:
+			self.n_chars += len(text)
+			if self.n_chars > self.max_chars:
+				# Too big to cache; stop copying.
+				self.chunks = None
+			else:
+				self.chunks.append(text)
+		return self.stream.write(text)
+
+	def getvalue(self):
+		return None if self.chunks is None else ''.join(self.chunks)
+
+	def __getattr__(self, name):
+		return getattr(self.stream, name)
+
+class Result_Cache(object):
+
+	def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_BYTES):
+		self.cache_dir = cache_dir or default_cache_dir()
+		self.max_bytes = max_bytes
+
+	@staticmethod
+	def make_key(*parts):
+		import hashlib
+		return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+	def entry_path(self, key):
+		return os.path.join(self.cache_dir, '%s.out' % (key,))
+
+	def get(self, key):
+		entry_path = self.entry_path(key)
+		try:
+			with open(entry_path, 'rb') as entry_f:
+				output = entry_f.read()
+			# Mark it recently used.
+			os.utime(entry_path)
+		except OSError:
+			return None
+		return output.decode('utf-8')
+
+	def put(self, key, output):
+		data = output.encode('utf-8')
+		if len(data) > self.max_bytes:
+			return False
+		import tempfile
+		try:
+			os.makedirs(self.cache_dir, exist_ok=True)
+			# Write aside and rename, so a concurrent run never reads half.
+			(tmp_fd, tmp_path) = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+			with os.fdopen(tmp_fd, 'wb') as tmp_f:
+				tmp_f.write(data)
+			os.replace(tmp_path, self.entry_path(key))
+		except OSError:
+			return False
+		self.trim()
+		return True
+
+	def trim(self):
+		entries = []
+		total_bytes = 0
+		try:
+			for dir_entry in os.scandir(self.cache_dir):
+				if not dir_entry.name.endswith('.out'):
+					continue
+				stat = dir_entry.stat()
+				entries.append((stat.st_mtime_ns, stat.st_size, dir_entry.path,))
+				total_bytes += stat.st_size
+		except OSError:
+			return
+		entries.sort()
+		for (mtime_ns, size, path) in entries:
+			if total_bytes <= self.max_bytes:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			total_bytes -= size
+
+class Memory_Result_Cache(object):
+	"""Like Result_Cache, but in memory, for a long-running process."""
+
+	def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+		self.max_bytes = max_bytes
+		self.n_chars = 0
+		self.entries = collections.OrderedDict()
+
+	def get(self, key):
+		output = self.entries.get(key)
+		if output is not None:
+			self.entries.move_to_end(key)
+		return output
+
+	def put(self, key, output):
+		if len(output) > self.max_bytes:
+			return False
+		if key in self.entries:
+			self.n_chars -= len(self.entries.pop(key))
+		self.entries[key] = output
+		self.n_chars += len(output)
+		while self.n_chars > self.max_bytes:
+			(_key, evicted) = self.entries.popitem(last=False)
+			self.n_chars -= len(evicted)
+		return True
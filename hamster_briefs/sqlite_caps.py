@@ -0,0 +1,136 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""What the SQLite we run reports on can do, so they can use the quickest SQL.
+
+We ask SQLite, rather than compare version numbers, because distributions
+build SQLite with and without FTS5, JSON1, and R*Tree, and because the
+sqlite3 executable is often a different SQLite than Python's.
+
+Each probe runs against an empty in-memory database, and selects its
+name only if SQLite could do what it asks (otherwise, it fails, or it
+selects nothing). So the executable can run all of them in one go, and
+we read which worked off its stdout.
+"""
+
+import sqlite3
+
+# (name, what uses it, setup statements, check that selects the name)
+CAPABILITY_PROBES = [
+	(
+		'printf',
+		"Report formatting (SQLite 3.8.3); else, --sqlite3 auto uses the executable",
+		[],
+		"SELECT 'printf' WHERE printf('%.3f', 1) = '1.000'",
+	),
+	(
+		'window_functions',
+		"ROW_NUMBER() dedupes facts that start at the same time (SQLite 3.25)",
+		[],
+		"SELECT 'window_functions' FROM "
+			"(SELECT ROW_NUMBER() OVER (ORDER BY 1) AS nth) WHERE nth = 1",
+	),
+	(
+		'unixepoch',
+		"Fact durations in whole seconds (SQLite 3.38); else, rounded julianday()s",
+		[],
+		"SELECT 'unixepoch' WHERE unixepoch('1970-01-02') = 86400",
+	),
+	(
+		'fts5',
+		"--query and --description",
+		["CREATE VIRTUAL TABLE temp.hamster_briefs_probe_fts5 USING fts5(a)",],
+		"SELECT 'fts5' FROM sqlite_temp_master WHERE name = 'hamster_briefs_probe_fts5'",
+	),
+	(
+		'json1',
+		"(Not used yet)",
+		[],
+		"SELECT 'json1' WHERE json_array(1) = '[1]'",
+	),
+	(
+		'rtree',
+		"(Not used yet)",
+		["CREATE VIRTUAL TABLE temp.hamster_briefs_probe_rtree USING rtree(id, x0, x1)",],
+		"SELECT 'rtree' FROM sqlite_temp_master WHERE name = 'hamster_briefs_probe_rtree'",
+	),
+]
+
+class Sqlite_Caps(object):
+
+	def __init__(self, version, capabilities, where='python'):
+		self.version = version
+		self.capabilities = set(capabilities)
+		self.where = where
+		self.printf = 'printf' in self.capabilities
+		self.window_functions = 'window_functions' in self.capabilities
+		self.unixepoch = 'unixepoch' in self.capabilities
+		self.fts5 = 'fts5' in self.capabilities
+		self.json1 = 'json1' in self.capabilities
+		self.rtree = 'rtree' in self.capabilities
+
+	def describe(self):
+		return 'SQLite %s (%s): %s' % (
+			self.version or '?',
+			self.where,
+			', '.join([
+				name for (name, used_by, setup, check) in CAPABILITY_PROBES
+				if name in self.capabilities
+			]) or 'none',
+		)
+
+def probe_connection(conn):
+	found = []
+	for (name, used_by, setup, check) in CAPABILITY_PROBES:
+		try:
+			for sql_stmt in setup:
+				conn.execute(sql_stmt)
+			if conn.execute(check).fetchall():
+				found.append(name)
+		except sqlite3.Error:
+			pass
+	return found
+
+# Python's SQLite doesn't change while we run, so probe it once.
+python_caps = None
+
+def module_caps():
+	"""Return what Python's sqlite3 module's SQLite can do."""
+	global python_caps
+	if python_caps is None:
+		conn = sqlite3.connect(':memory:')
+		try:
+			python_caps = Sqlite_Caps(sqlite3.sqlite_version, probe_connection(conn))
+		finally:
+			conn.close()
+	return python_caps
+
+def executable_caps(sqlite3_path='sqlite3'):
+	"""Return what the sqlite3 executable can do."""
+	import os
+	import subprocess
+	sql_script = ''.join([
+		''.join(['%s;\n' % (sql_stmt,) for sql_stmt in setup] + ['%s;\n' % (check,)])
+		for (name, used_by, setup, check) in CAPABILITY_PROBES
+	]) + "SELECT 'version ' || sqlite_version();\n"
+	try:
+		# Skip ~/.sqliterc, which might print things, or load extensions.
+		ret = subprocess.run(
+			[sqlite3_path, '-batch', '-init', os.devnull, ':memory:',],
+			input=sql_script.encode('utf-8'),
+			stdout=subprocess.PIPE,
+			stderr=subprocess.DEVNULL,
+		)
+	except OSError:
+		return Sqlite_Caps(None, [], where=sqlite3_path)
+	names = set([name for (name, used_by, setup, check) in CAPABILITY_PROBES])
+	version = None
+	found = []
+	for outln in ret.stdout.decode('utf-8', 'replace').split('\n'):
+		outln = outln.strip()
+		if outln.startswith('version '):
+			version = outln[len('version '):]
+		elif outln in names:
+			found.append(outln)
+	return Sqlite_Caps(version, found, where=sqlite3_path)
@@ -0,0 +1,109 @@
+# coding: utf-8
+# Copyright: © 2016-2018 Landon Bouma.
+#  vim:tw=0:ts=4:sw=4:noet
+
+"""A long-lived sqlite3 shell that runs one query after another.
+
+On hosts whose Python sqlite3 is too old (see Hamsterer.sqlite3_too_old),
+hamster-briefs used to fork the sqlite3 binary once per report. This
+starts the binary once and feeds it every query on stdin instead. After
+each query, we select a sentinel, so we know where each result ends on
+stdout. sqlite3 writes a statement's errors to stderr before it runs the
+next statement, so once we see the sentinel, that query's stderr is
+already in the pipe, and we can drain it without blocking.
+"""
+
+import os
+import select
+import subprocess
+import uuid
+
+class Sqlite3_Coprocess_Error(Exception):
+	pass
+
+class Sqlite3_Coprocess(object):
+
+	def __init__(self, db_path, sqlite3_path='sqlite3'):
+		self.db_path = db_path
+		self.sqlite3_path = sqlite3_path
+		self.proc = None
+		self.n_queries = 0
+		# Something no report would ever select.
+		self.sentinel_prefix = '-- hamster-briefs %s' % (uuid.uuid4().hex,)
+		# The stderr lines of the last query (and of starting up, for
+		# the first query, e.g., "-- Loading resources from ~/.sqliterc").
+		self.errlns = []
+
+	def start(self):
+		self.proc = subprocess.Popen(
+			[self.sqlite3_path, '-batch', self.db_path,],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+			bufsize=0,
+		)
+
+	def close(self):
+		if self.proc is None:
+			return
+		try:
+			self.proc.stdin.write(b'.quit\n')
+			self.proc.stdin.close()
+		except (BrokenPipeError, OSError):
+			pass
+		self.proc.stdout.close()
+		self.proc.stderr.close()
+		self.proc.wait()
+		self.proc = None
+
+	def write_input(self, text):
+		try:
+			self.proc.stdin.write(text.encode('utf-8'))
+		except (BrokenPipeError, OSError) as err:
+			raise Sqlite3_Coprocess_Error('sqlite3 went away: %s' % (str(err),))
+
+	def drain_stderr(self):
+		chunks = []
+		errs_fd = self.proc.stderr.fileno()
+		while select.select([errs_fd,], [], [], 0)[0]:
+			chunk = os.read(errs_fd, 65536)
+			if not chunk:
+				break
+			chunks.append(chunk)
+		return b''.join(chunks).decode('utf-8', 'replace').split('\n')
+
+	def query_lines(self, sql_select, use_header=False):
+		"""Yield the stdout lines of sql_select (sans line endings).
+
+		Consume them all before running the next query; afterwards,
+		self.errlns holds whatever the query wrote to stderr.
+		"""
+		if self.proc is None:
+			self.start()
+		self.n_queries += 1
+		sentinel = '%s %d' % (self.sentinel_prefix, self.n_queries,)
+		self.errlns = []
+		self.write_input(
+			'.headers %s\n%s;\n.headers off\nSELECT \'%s\';\n'
+			% ('on' if use_header else 'off', sql_select, sentinel,)
+		)
+		sentinel_ln = sentinel.encode('utf-8')
+		while True:
+			outln = self.proc.stdout.readline()
+			if not outln:
+				self.errlns = self.drain_stderr()
+				raise Sqlite3_Coprocess_Error(
+					'sqlite3 exited mid-query: %s' % (self.errlns,)
+				)
+			if outln.endswith(b'\n'):
+				outln = outln[:-1]
+			if outln.rstrip(b'\r') == sentinel_ln:
+				break
+			yield outln.decode('utf-8')
+		self.errlns = self.drain_stderr()
+
+	def execute(self, sql):
+		"""Run a statement that returns no rows; returns the stderr lines."""
+		for outln in self.query_lines(sql):
+			pass
+		return self.errlns
@@ -265,6 +265,9 @@ class Transformer(pyoiler_argparse.Simple_Script_Base):
 			# The date of the entry, how much time was spent, and a description.
 			"year_month_day": year_month_day,
 			"time_spent": round(float(time_spent), 3),
+			# The briefs' hours are whole seconds / 3600, so this is exact
+			# (unlike 3600 * time_spent, which is off by up to 1.8 secs.).
+			"time_spent_secs": int(round(3600 * float(time_spent))),
 			"desctimes": desctimes,
 			# 2017-08-02: activity_id is pretty meaningless to us.
 			#"activity_id": activity_id,
@@ -696,6 +699,14 @@ class Transformer(pyoiler_argparse.Simple_Script_Base):
 			tags = []
 		return tags
 
+	def entry_time_spent_secs(self, entry):
+		# Use the exact seconds, unless the user edited time_spent (or the
+		# JSON predates time_spent_secs).
+		secs = entry.get('time_spent_secs')
+		if (secs is None) or (round(secs / 3600.0, 3) != entry['time_spent']):
+			secs = int(round(60 * 60 * entry['time_spent']))
+		return secs
+
 	def prepare_tempo_payload(self, entry):
 		tempo_payload = {
 			"author": {
@@ -713,7 +724,7 @@ class Transformer(pyoiler_argparse.Simple_Script_Base):
 				#item_id? itemId? hrmm: entry['issue_id'],
 			},
 			"dateStarted": "%sT00:00:00.000+0000" % (entry['year_month_day'],),
-			"timeSpentSeconds": "%d" % (int(60 * 60 * entry['time_spent']),),
+			"timeSpentSeconds": "%d" % (self.entry_time_spent_secs(entry),),
 			"comment": self.cli_opts.comment_delimiter.join(entry['desctimes']),
 		}
 		entry['payload'] = tempo_payload
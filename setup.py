@@ -132,6 +132,8 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        # For `hamster-briefs --engine numpy`.
+        'numpy': ['numpy'],
     },
 
     # If there are data files included in your packages that need to be
@@ -157,6 +159,7 @@ setup(
     entry_points={
         'console_scripts': [
             'hamster-briefs=hamster_briefs.hamster_briefs:main',
+            'hamster-briefs-client=hamster_briefs.briefs_client:main',
             'hamster-love=hamster_briefs:run_hamster_love',
             'transform-brief=hamster_briefs.transform_brief:main',
         ],
@@ -2,6 +2,960 @@
 # testing in general, but rather to support the `find_packages` example in
 # setup.py that excludes installing the "tests" package
 
+import sqlite3
+
+from hamster_briefs import brief_engine
+from hamster_briefs import brief_render
+
 
 def test_success():
     assert True
+
+
+def make_hamster_db(db_path, facts):
+    # facts: (id, activity_id, start_time, end_time, deleted).
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT, search_name TEXT);
+        CREATE TABLE activities (
+            id INTEGER PRIMARY KEY, name TEXT, category_id INTEGER,
+            search_name TEXT, deleted INTEGER
+        );
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT, autocomplete INTEGER);
+        CREATE TABLE facts (
+            id INTEGER PRIMARY KEY, activity_id INTEGER, start_time TIMESTAMP,
+            end_time TIMESTAMP, description TEXT, deleted INTEGER
+        );
+        CREATE TABLE fact_tags (fact_id INTEGER, tag_id INTEGER);
+        INSERT INTO categories VALUES (1, 'work', 'work'), (2, 'home', 'home');
+        INSERT INTO activities VALUES
+            (1, 'Coding', 1, 'coding', 0), (2, 'Cooking', 2, 'cooking', 0);
+        INSERT INTO tags VALUES (1, 'alpha', 1);
+        INSERT INTO fact_tags VALUES (1, 1);
+    """)
+    conn.executemany(
+        "INSERT INTO facts (id, activity_id, start_time, end_time, deleted)"
+        " VALUES (?, ?, ?, ?, ?)",
+        facts,
+    )
+    conn.commit()
+    conn.close()
+
+
+# The facts the report tests share: two categories, tags, a fact that a
+# newer fact with the same start time hides, a deleted fact, and a
+# description that spans lines.
+REPORT_FACTS = [
+    (1, 1, '2017-01-02 08:00:00', '2017-01-02 10:00:00', 0),
+    (2, 2, '2017-01-03 08:00:00', '2017-01-03 09:30:00', 0),
+    (3, 1, '2017-01-03 10:00:00', '2017-01-03 11:15:00', 0),
+    (4, 2, '2017-01-10 09:00:00', '2017-01-10 09:10:00', 0),
+    (5, 1, '2017-01-10 08:00:00', '2017-01-10 08:45:00', 0),
+    (6, 2, '2017-01-12 08:00:00', '2017-01-12 08:20:00', 0),
+    (7, 1, '2017-01-12 08:00:00', '2017-01-12 09:00:00', 0),
+    (8, 2, '2017-01-16 18:00:00', '2017-01-16 19:00:00', 1),
+]
+
+REPORT_ARGS = ['-b', '2017-01-01', '-e', '2017-02-01']
+
+
+def make_report_db(tmpdir):
+    db_path = str(tmpdir.join('hamster.db'))
+    make_hamster_db(db_path, REPORT_FACTS)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        INSERT INTO tags VALUES (2, 'beta', 1);
+        INSERT INTO fact_tags VALUES (3, 2), (5, 1), (5, 2);
+        UPDATE facts SET description = 'Soup,' || char(10) || 'then bread'
+            WHERE id = 2;
+    """)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def run_briefs(monkeypatch, capsys, argv):
+    import sys
+    from hamster_briefs import hamster_briefs
+    monkeypatch.setattr(sys, 'argv', ['hamster-briefs'] + list(argv))
+    hamster_briefs.Hamsterer().go()
+    return capsys.readouterr().out
+
+
+def test_in_process_reports_print_what_sqlite3_prints(tmpdir, monkeypatch, capsys):
+    import shutil
+    import pytest
+    if shutil.which('sqlite3') is None:
+        pytest.skip('No sqlite3 binary')
+    db_path = make_report_db(tmpdir)
+    for report_args in (
+        ['-r', 'gross', '-r', 'daily', '-r', 'weekly', '-T', '-C'],
+        ['-A'],
+        ['-a', 'Cod', '-t', 'beta', '-r', 'daily', '-s'],
+        ['-a', 'Cod', '-t', 'beta', '--and', '-r', 'gross'],
+    ):
+        argv = ['-D', db_path] + REPORT_ARGS + report_args
+        outputs = []
+        for sqlite3_mode in ('internal', 'subprocess',):
+            outputs.append(run_briefs(
+                monkeypatch, capsys, argv + ['--sqlite3', sqlite3_mode],
+            ))
+        assert '|' in outputs[0]
+        assert outputs[0] == outputs[1]
+
+
+def test_fact_durations_temp_table_prints_what_the_subquery_prints(
+    tmpdir, monkeypatch, capsys,
+):
+    from hamster_briefs.hamster_briefs import Hamsterer
+    db_path = make_report_db(tmpdir)
+    argv = ['-D', db_path] + REPORT_ARGS + [
+        '-a', 'Cod', '-t', 'beta', '-r', 'gross', '-r', 'daily', '-r', 'weekly', '-T',
+    ]
+    staged = []
+    setup_temp = Hamsterer.setup_sql_fact_durations_temp
+
+    def setup_temp_spy(self):
+        staged.append(self.list_type)
+        setup_temp(self)
+
+    monkeypatch.setattr(Hamsterer, 'setup_sql_fact_durations_temp', setup_temp_spy)
+    staged_output = run_briefs(monkeypatch, capsys, argv)
+    assert staged
+    assert 'Coding' in staged_output
+    # Without the temp table, each report runs the subquery itself.
+    monkeypatch.setattr(Hamsterer, 'setup_sql_fact_durations_temp', lambda self: None)
+    assert run_briefs(monkeypatch, capsys, argv) == staged_output
+
+
+def test_brief_engine_formats_like_sqlite():
+    conn = sqlite3.connect(':memory:')
+    curs = conn.cursor()
+    for start_time, duration, name in (
+        ('2016-02-09 10:00:00', 600, 'Bathroom'),
+        ('1999-12-31 23:59:59', 444444, None),
+        ('2016-01-03 00:00:00', 2, 'a' * 60),
+        ('2016-01-04 00:00:00', -1, 'b'),
+    ):
+        curs.execute(
+            "SELECT julianday(?), strftime('%Y-%m-%d', julianday(?))"
+            ", CAST(strftime('%w', ?) AS INTEGER)"
+            ", substr('       ' || printf('%.3f', ? / 3600.0), -8, 8)"
+            ", substr('            ' || ?, -12, 12)"
+            ", substr(? || '                                                      ', 0, 54)",
+            (start_time, start_time, start_time, duration, name, name,)
+        )
+        (julian_day, ymd, weekday, durn, cat, act) = curs.fetchone()
+        assert brief_engine.julian_day_to_date(julian_day) == ymd
+        assert brief_engine.julian_day_to_day_of_week(julian_day) == (
+            brief_engine.DAY_OF_WEEK_NAMES[weekday]
+        )
+        assert brief_render.format_duration(duration) == durn
+        assert brief_render.format_category(name) == (cat or '')
+        assert brief_render.format_activity(name) == (act or '')
+    # 27 seconds is 0.0075 hours, which rounds up (though SQLite >= 3.43
+    # rounds the binary float, a hair under, down).
+    assert brief_render.format_duration(27) == '   0.008'
+
+
+def test_brief_engine_gross_totals_without_facts():
+    # An aggregate without a GROUP BY still returns a row.
+    engine = brief_engine.Brief_Engine(['gross-totals', 'daily-totals'])
+    assert engine.output_lines('gross-totals') == ['sat||   0.000']
+    assert engine.output_lines('daily-totals') == []
+
+
+def test_numpy_engine_prints_what_the_sql_engine_prints(tmpdir, monkeypatch, capsys):
+    import pytest
+    pytest.importorskip('numpy')
+    db_path = make_report_db(tmpdir)
+    for report_args in (
+        ['-r', 'gross', '-r', 'daily', '-r', 'weekly', '-T', '-C'],
+        ['-r', 'sprint-summary', '-w', 'wed', '-a', 'Cod', '-t', 'beta'],
+    ):
+        argv = ['-D', db_path] + REPORT_ARGS + report_args
+        outputs = [
+            run_briefs(monkeypatch, capsys, argv + ['--engine', engine])
+            for engine in ('sql', 'numpy',)
+        ]
+        assert '|' in outputs[0]
+        assert outputs[1] == outputs[0]
+
+
+def test_streamed_reports_print_what_buffered_reports_printed(
+    tmpdir, monkeypatch, capsys,
+):
+    import shutil
+    from hamster_briefs.hamster_briefs import Hamsterer
+    # What -A and -r daily-tag -s printed when they read the whole
+    # result before printing any of it.
+    buffered_output = '\n'.join([
+        '',
+        'ALL FACTS [all]',
+        '===============',
+        'mon|2017-01-02|08:00|10:00| 2.000|Coding|alpha|',
+        'tue|2017-01-03|08:00|09:30| 1.500|Cooking||Soup,\\n\\nthen bread',
+        'tue|2017-01-03|10:00|11:15| 1.250|Coding|beta|',
+        'tue|2017-01-10|08:00|08:45| 0.750|Coding|alpha|',
+        'tue|2017-01-10|08:00|08:45| 0.750|Coding|beta|',
+        'tue|2017-01-10|09:00|09:10| 0.167|Cooking||',
+        'thu|2017-01-12|08:00|09:00| 1.000|Coding||',
+        'thu|2017-01-12|08:00|08:20| 0.333|Cooking||',
+        '',
+        'DAILY TAG TOTALS [daily-tag]',
+        '============================',
+        'mon|2017-01-02|   2.000|alpha',
+        '',
+        'tue|2017-01-03|   1.250|beta',
+        'tue|2017-01-03|   1.500|',
+        'tue|2017-01-10|   0.750|alpha,beta',
+        'tue|2017-01-10|   0.167|',
+        '',
+        'thu|2017-01-12|   1.000|',
+        '',
+    ])
+    db_path = make_report_db(tmpdir)
+    argv = ['-D', db_path] + REPORT_ARGS + ['-A', '-r', 'daily-tag', '-s']
+    sqlite3_modes = ['internal']
+    if shutil.which('sqlite3') is not None:
+        sqlite3_modes.append('subprocess')
+    for sqlite3_mode in sqlite3_modes:
+        output = run_briefs(monkeypatch, capsys, argv + ['--sqlite3', sqlite3_mode])
+        assert output == buffered_output
+    # Each line goes out before the next one after it is read.
+    lines_read = []
+
+    def read_lines():
+        for outln in ('a|1', 'more', 'b|2', 'c|3',):
+            lines_read.append(outln)
+            yield outln
+
+    outlns = Hamsterer().output_reassemble_split_line_comments(read_lines())
+    assert next(outlns) == 'a|1\\n\\nmore'
+    assert lines_read == ['a|1', 'more', 'b|2']
+
+
+def test_sqlite3_coprocess_delimits_results(tmpdir):
+    import shutil
+    import pytest
+    from hamster_briefs import sqlite_coproc
+    if shutil.which('sqlite3') is None:
+        pytest.skip('No sqlite3 binary')
+    db_path = str(tmpdir.join('hamster.db'))
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE facts (id INTEGER PRIMARY KEY, description TEXT)")
+    conn.execute("INSERT INTO facts VALUES (1, 'one'), (2, 'two\nlines')")
+    conn.commit()
+    conn.close()
+    coproc = sqlite_coproc.Sqlite3_Coprocess(db_path)
+    try:
+        assert list(coproc.query_lines("SELECT nope FROM facts")) == []
+        assert [x for x in coproc.errlns if 'nope' in x]
+        assert list(coproc.query_lines(
+            "SELECT * FROM facts ORDER BY id", use_header=True,
+        )) == ['id|description', '1|one', '2|two', 'lines']
+        assert not [x for x in coproc.errlns if x]
+    finally:
+        coproc.close()
+
+
+def test_index_advisor_creates_missing_indexes():
+    from hamster_briefs import index_advisor
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        "CREATE TABLE facts (id INTEGER PRIMARY KEY, activity_id INTEGER,"
+        " start_time TIMESTAMP, end_time TIMESTAMP, deleted INTEGER)"
+    )
+    # An existing full index serves the partial one we'd want.
+    conn.execute("CREATE INDEX facts_start ON facts (start_time)")
+    advice = dict(
+        (spec.name, existing)
+        for (spec, existing) in index_advisor.advise_indexes(conn)
+    )
+    # No fact_tags table, so no fact_tags advice.
+    assert 'hamster_briefs_fact_tags_fact_id' not in advice
+    assert advice['hamster_briefs_facts_start_time'] == 'facts_start'
+    assert advice['hamster_briefs_facts_open'] is None
+    created = index_advisor.ensure_indexes(conn)
+    assert 'hamster_briefs_facts_start_time' not in [x.name for x in created]
+    assert not [
+        spec for (spec, existing) in index_advisor.advise_indexes(conn)
+        if not existing
+    ]
+
+
+def test_query_plan_marks_costly_steps():
+    from hamster_briefs import index_advisor
+    plan_lines = index_advisor.format_query_plan(index_advisor.parse_plan_lines([
+        'QUERY PLAN',
+        '|--MATERIALIZE max',
+        '|  `--SCAN facts',
+        '|--SCAN max',
+        '`--USE TEMP B-TREE FOR ORDER BY',
+    ]))
+    assert [x.split(' <-- ')[-1] if ' <-- ' in x else None for x in plan_lines] == [
+        None, 'full table scan', None, 'temp b-tree',
+    ]
+    assert plan_lines[1].startswith('   SCAN facts')
+
+
+def test_daily_rollup_rolls_up_new_facts_on_closed_days(tmpdir):
+    from hamster_briefs import daily_rollup
+    conn = sqlite3.connect(str(tmpdir.join('hamster.db')))
+    conn.execute(
+        "CREATE TABLE facts (id INTEGER PRIMARY KEY, activity_id INTEGER,"
+        " start_time TIMESTAMP, end_time TIMESTAMP, deleted INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO facts VALUES"
+        " (1, 1, '2017-01-02 09:00:00', '2017-01-02 10:00:00', 0),"
+        " (2, 1, '2017-01-02 11:00:00', '2017-01-02 11:30:00', 0),"
+        " (3, 2, '2017-01-03 09:00:00', NULL, 0)"
+    )
+    sql_fact_durations = """
+        SELECT start_time, activity_id, NULL AS tag_names,
+            24.0 * (julianday(end_time) - julianday(start_time)) AS duration
+        FROM facts
+        WHERE NOT deleted
+            AND start_time >= datetime(?) AND start_time < datetime(?)
+    """
+    rollup = daily_rollup.Daily_Rollup(
+        conn, daily_rollup.rollup_path_for(str(tmpdir.join('hamster.db'))),
+    )
+    rollup.attach()
+    # The open fact's day stays live.
+    assert rollup.sync(sql_fact_durations) == '2017-01-03'
+    rollup_sql = (
+        "SELECT day, start_time, round(duration, 3), n_facts FROM rollup.daily_rollup"
+    )
+    assert conn.execute(rollup_sql).fetchall() == [
+        ('2017-01-02', '2017-01-02 09:00:00', 1.5, 2),
+    ]
+    conn.execute("UPDATE facts SET end_time = '2017-01-03 10:00:00' WHERE id = 3")
+    conn.execute(
+        "INSERT INTO facts VALUES"
+        " (4, 1, '2017-01-02 08:00:00', '2017-01-02 08:30:00', 0)"
+    )
+    assert rollup.sync(sql_fact_durations) > '2017-01-03'
+    assert conn.execute(rollup_sql + " ORDER BY day").fetchall() == [
+        ('2017-01-02', '2017-01-02 08:00:00', 2.0, 3),
+        ('2017-01-03', '2017-01-03 09:00:00', 1.0, 1),
+    ]
+    # hamster marks facts deleted, which the rollup must notice, too.
+    conn.execute("UPDATE facts SET deleted = 1 WHERE id = 2")
+    rollup.sync(sql_fact_durations)
+    live_rows = conn.execute(
+        "SELECT date(start_time) AS day, min(start_time), round(sum(duration), 3),"
+        " count(*) FROM (%s) GROUP BY day ORDER BY day" % (sql_fact_durations,),
+        ('0000-01-01', '2017-01-04',)
+    ).fetchall()
+    assert live_rows == [
+        ('2017-01-02', '2017-01-02 08:00:00', 1.5, 2),
+        ('2017-01-03', '2017-01-03 09:00:00', 1.0, 1),
+    ]
+    assert conn.execute(rollup_sql + " ORDER BY day").fetchall() == live_rows
+
+
+def test_fact_durations_keep_newest_fact_per_start_time():
+    from hamster_briefs.hamster_briefs import Hamsterer
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE activities (id INTEGER PRIMARY KEY, name TEXT, category_id INTEGER);
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE facts (
+            id INTEGER PRIMARY KEY, activity_id INTEGER, start_time TIMESTAMP,
+            end_time TIMESTAMP, description TEXT, deleted INTEGER
+        );
+        CREATE TABLE fact_tags (fact_id INTEGER, tag_id INTEGER);
+        INSERT INTO categories VALUES (1, 'work');
+        INSERT INTO activities VALUES (1, 'Coding', 1), (2, 'Meetings', 1);
+        INSERT INTO tags VALUES (1, 'alpha'), (2, 'beta');
+        INSERT INTO facts VALUES
+            (1, 1, '2017-01-02 08:00:00', '2017-01-02 10:00:00', NULL, 0),
+            (2, 2, '2017-01-02 10:00:00', '2017-01-02 11:00:00', NULL, 0),
+            (3, 2, '2017-01-02 10:00:00', '2017-01-02 10:30:00', 'Edited', 0),
+            (4, 1, '2017-01-02 11:00:00', '2017-01-02 12:00:00', NULL, 1),
+            (5, 1, '2017-01-02 11:00:00', '2017-01-02 11:45:00', NULL, 0);
+        INSERT INTO fact_tags VALUES (1, 1), (1, 2), (2, 1), (3, 2), (5, 1);
+    """)
+    for sql_stmt in Hamsterer.sql_calendar_stmts(0):
+        conn.execute(sql_stmt)
+    str_params = {
+        'SQL_WEEK_STARTS': 0,
+        'SQL_BEG_DATE': '',
+        'SQL_END_DATE': '',
+        'SQL_LIVE_FROM': '',
+        'SQL_ACTS_AND_TAGS': '',
+        'REPORT_CATEGORIES': '',
+        'SQL_CATEGORY_START_TIMES': '',
+    }
+    results = []
+    for (window_functions, unixepoch) in ((True, True), (False, False)):
+        if unixepoch and (sqlite3.sqlite_version_info < (3, 38, 0)):
+            unixepoch = False
+        sql_select = Hamsterer.sql_fact_durations_format(
+            str_params, window_functions, unixepoch,
+        )
+        results.append(conn.execute(
+            "SELECT fact_id, duration, tag_names FROM (%s)" % (sql_select,)
+        ).fetchall())
+    # The newer fact (and only its tags) wins; the deleted fact doesn't.
+    # (And the durations are whole seconds.)
+    assert results[0] == [
+        (1, 7200, 'alpha,beta'),
+        (3, 1800, 'beta'),
+        (5, 2700, 'alpha'),
+    ]
+    assert results[1] == results[0]
+
+
+def test_sqlite_caps_probe_what_sqlite_can_do():
+    from hamster_briefs import sqlite_caps
+    caps = sqlite_caps.module_caps()
+    assert caps.printf
+    assert caps.window_functions == (sqlite3.sqlite_version_info >= (3, 25, 0))
+    assert caps.unixepoch == (sqlite3.sqlite_version_info >= (3, 38, 0))
+    assert caps.describe().startswith('SQLite %s (python): printf' % (sqlite3.sqlite_version,))
+    # Without a sqlite3 executable, it can do nothing.
+    caps = sqlite_caps.executable_caps('/nonexistent/sqlite3')
+    assert (caps.version, caps.capabilities) == (None, set())
+
+
+def test_fact_search_indexes_new_and_renamed_facts(tmpdir):
+    from hamster_briefs import fact_search
+    db_path = str(tmpdir.join('hamster.db'))
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE activities (id INTEGER PRIMARY KEY, name TEXT, category_id INTEGER);
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE facts (id INTEGER PRIMARY KEY, activity_id INTEGER, description TEXT);
+        CREATE TABLE fact_tags (fact_id INTEGER, tag_id INTEGER);
+        INSERT INTO categories VALUES (1, 'work');
+        INSERT INTO activities VALUES (1, 'Coding', 1), (2, 'Meetings', 1);
+        INSERT INTO tags VALUES (1, 'client-x');
+        INSERT INTO facts VALUES (1, 1, 'Fixed the parser'), (2, 2, 'Standup');
+        INSERT INTO fact_tags VALUES (2, 1);
+    """)
+    conn.commit()
+    search = fact_search.Fact_Search(fact_search.search_path_for(db_path))
+
+    def matches(queries, descriptions=None):
+        search.sync(db_path)
+        return search.fact_ids(fact_search.match_query(queries, descriptions))
+
+    assert matches(['pars']) == [1]
+    assert matches(['client-x']) == [2]
+    assert matches(['work'], ['standup']) == [2]
+    assert matches(['coding', 'meetings']) == [1, 2]
+    conn.execute("INSERT INTO facts VALUES (3, 1, 'Parser tests')")
+    conn.commit()
+    assert matches(['parser']) == [1, 3]
+    assert search.n_indexed == 1
+    conn.execute("UPDATE activities SET name = 'Hacking' WHERE id = 1")
+    conn.commit()
+    assert matches(['hack']) == [1, 3]
+    assert search.n_indexed == 3
+
+
+def test_fact_sweep_finds_gaps_and_overlaps():
+    from hamster_briefs import fact_sweep
+    conn = sqlite3.connect(':memory:')
+    facts = [
+        (1, '2017-01-02 08:00:00', '2017-01-02 09:00:00'),
+        (2, '2017-01-02 09:30:00', '2017-01-02 12:00:00'),
+        (3, '2017-01-02 10:00:00', '2017-01-02 11:00:00'),
+        (4, '2017-01-02 11:30:00', '2017-01-02 12:30:00'),
+        (5, '2017-01-02 11:30:00', '2017-01-02 12:30:00'),
+        (6, '2017-01-02 12:35:00', '2017-01-02 17:00:00'),
+        (7, '2017-01-03 08:00:00', '2017-01-03 09:00:00'),
+    ]
+    rows = [
+        fact + conn.execute("SELECT julianday(?), julianday(?)", fact[1:]).fetchone()
+        for fact in facts
+    ]
+    found = [
+        (kind, latest[0], fact_row[0], round(days * 24 * 60))
+        for (kind, latest, fact_row, days)
+        in fact_sweep.sweep_facts(rows, min_gap_days=15 / (24.0 * 60.0))
+    ]
+    assert found == [
+        ('gap', 1, 2, 30),
+        ('overlap', 2, 3, 60),
+        ('overlap', 2, 4, 30),
+        ('duplicate', 4, 5, 60),
+    ]
+
+
+def test_result_cache_trims_least_recently_used(tmpdir):
+    import os
+    from hamster_briefs import result_cache
+    cache = result_cache.Result_Cache(str(tmpdir), max_bytes=25)
+    assert cache.put('old', 'x' * 10)
+    assert cache.put('new', 'y' * 10)
+    # A hit makes 'old' the most recently used.
+    os.utime(cache.entry_path('new'), ns=(0, 0))
+    assert cache.get('old') == 'x' * 10
+    assert cache.put('newest', 'z' * 10)
+    assert cache.get('new') is None
+    assert cache.get('old') == 'x' * 10
+    assert cache.get('newest') == 'z' * 10
+    assert not cache.put('huge', 'h' * 26)
+
+
+def test_briefs_server_answers_client(tmpdir):
+    import threading
+    from hamster_briefs import briefs_client
+    from hamster_briefs import briefs_server
+
+    class Fake_Script(object):
+        def __init__(self, briefs_server=None):
+            pass
+
+        def go(self):
+            import sys
+            if sys.argv[1:] == ['fail']:
+                sys.exit(3)
+            print('%s %s' % (sys.argv[0], ' '.join(sys.argv[1:])))
+
+    socket_path = str(tmpdir.join('briefs.sock'))
+    server = briefs_server.Briefs_Server(Fake_Script, socket_path=socket_path)
+    listener = server.listen()
+
+    def serve_two():
+        for n_request in range(2):
+            (client, _addr) = listener.accept()
+            with client:
+                server.handle(client)
+
+    thread = threading.Thread(target=serve_two)
+    thread.start()
+    try:
+        response = briefs_client.request(['-1', '-r', 'gross'], socket_path, argv0='hb')
+        assert response == {'exit': 0, 'stdout': 'hb -1 -r gross\n', 'stderr': ''}
+        response = briefs_client.request(['fail'], socket_path)
+        assert response['exit'] == 3
+    finally:
+        thread.join()
+        listener.close()
+
+
+def test_briefs_client_main_connects_to_socket_option(tmpdir, monkeypatch, capsys):
+    import sys
+    import threading
+    import pytest
+    from hamster_briefs import briefs_client
+    from hamster_briefs import briefs_server
+
+    class Fake_Script(object):
+        def __init__(self, briefs_server=None):
+            pass
+
+        def go(self):
+            print(' '.join(sys.argv[1:]))
+
+    # Not where the client looks by default.
+    socket_path = str(tmpdir.join('elsewhere.sock'))
+    monkeypatch.delenv('HAMSTER_BRIEFS_SOCKET', raising=False)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmpdir.join('nowhere')))
+    server = briefs_server.Briefs_Server(Fake_Script, socket_path=socket_path)
+    listener = server.listen()
+    # If the client looks elsewhere, don't wait on it forever.
+    listener.settimeout(10)
+
+    def serve_two():
+        for n_request in range(2):
+            (client, _addr) = listener.accept()
+            with client:
+                server.handle(client)
+
+    thread = threading.Thread(target=serve_two)
+    thread.start()
+    try:
+        for socket_args in (['--socket', socket_path], ['--socket=' + socket_path]):
+            argv = ['hamster-briefs-client', '-1'] + socket_args + ['-r', 'gross']
+            monkeypatch.setattr(sys, 'argv', argv)
+            with pytest.raises(SystemExit) as exit_info:
+                briefs_client.main()
+            assert exit_info.value.code == 0
+            assert capsys.readouterr().out == ' '.join(argv[1:]) + '\n'
+    finally:
+        thread.join()
+        listener.close()
+
+
+def test_follow_refresh_leaves_hamster_db_unlocked(tmpdir, monkeypatch, capsys):
+    import sys
+    from hamster_briefs import hamster_briefs
+    db_path = str(tmpdir.join('hamster.db'))
+    make_hamster_db(db_path, [
+        (1, 1, '2017-01-02 08:00:00', '2017-01-02 10:00:00', 0),
+    ])
+    n_sleeps = []
+
+    def sleep(secs):
+        # Like hamster, write while --follow waits (and don't wait for locks).
+        if n_sleeps:
+            raise KeyboardInterrupt
+        n_sleeps.append(secs)
+        conn = sqlite3.connect(db_path, timeout=0)
+        conn.execute(
+            "INSERT INTO facts (id, activity_id, start_time, end_time, deleted)"
+            " VALUES (2, 1, '2017-01-03 08:00:00', '2017-01-03 09:00:00', 0)"
+        )
+        conn.commit()
+        conn.close()
+
+    monkeypatch.setattr(hamster_briefs.time, 'sleep', sleep)
+    monkeypatch.setattr(sys, 'argv', [
+        'hamster-briefs', '-D', db_path, '-b', '2017-01-01', '-e', '2017-02-01',
+        '-r', 'daily-totals', '--follow',
+    ])
+    hamster_briefs.Hamsterer().go()
+    frames = capsys.readouterr().out.split('\n\nDAILY')
+    assert len(frames) == 2
+    assert 'tue|2017-01-03|   1.000' not in frames[0]
+    assert frames[1].endswith('mon|2017-01-02|   2.000\ntue|2017-01-03|   1.000\n')
+
+
+def test_follow_reprints_reports_as_facts_change(tmpdir, monkeypatch, capsys):
+    import sys
+    from hamster_briefs import hamster_briefs
+    db_path = str(tmpdir.join('hamster.db'))
+    make_hamster_db(db_path, [
+        (1, 1, '2017-01-02 08:00:00', '2017-01-02 10:00:00', 0),
+        # The open fact, which grows until it's stopped.
+        (2, 2, '2017-01-03 08:00:00', None, 0),
+    ])
+    argv = [
+        'hamster-briefs', '-D', db_path, '-b', '2017-01-01', '-e', '2017-02-01',
+        '-r', 'daily-activity', '-r', 'gross-tag',
+    ]
+
+    def sleep(secs):
+        if sleep.n_sleeps:
+            raise KeyboardInterrupt
+        sleep.n_sleeps += 1
+        # Stop the open fact, and start (and stop) another.
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE facts SET end_time = '2017-01-03 09:30:00' WHERE id = 2")
+        conn.execute(
+            "INSERT INTO facts (id, activity_id, start_time, end_time, deleted)"
+            " VALUES (3, 1, '2017-01-04 08:00:00', '2017-01-04 08:45:00', 0)"
+        )
+        conn.commit()
+        conn.close()
+
+    sleep.n_sleeps = 0
+    monkeypatch.setattr(hamster_briefs.time, 'sleep', sleep)
+    monkeypatch.setattr(sys, 'argv', argv + ['--follow'])
+    hamster_briefs.Hamsterer().go()
+    frames = capsys.readouterr().out
+    # The next frame is the same as running the reports anew.
+    monkeypatch.setattr(sys, 'argv', argv)
+    hamster_briefs.Hamsterer().go()
+    reports = capsys.readouterr().out
+    assert 'wed|2017-01-04|   0.750' in reports
+    assert frames.endswith(reports)
+    assert frames[:-len(reports)] != reports
+    assert 'wed|2017-01-04' not in frames[:-len(reports)]
+
+
+def test_jobs_print_what_serial_runs_print(tmpdir, monkeypatch, capsys):
+    import sys
+    from hamster_briefs import hamster_briefs
+    from hamster_briefs import report_jobs
+    db_path = str(tmpdir.join('hamster.db'))
+    make_hamster_db(db_path, [
+        (1, 1, '2017-01-02 08:00:00', '2017-01-02 10:00:00', 0),
+        (2, 2, '2017-01-03 08:00:00', '2017-01-03 09:30:00', 0),
+        (3, 1, '2017-01-10 08:00:00', '2017-01-10 08:45:00', 0),
+        (4, 2, '2017-01-10 09:00:00', '2017-01-10 09:10:00', 0),
+    ])
+    list_types = [
+        'gross-activity', 'daily-tag', 'sprint-category', 'satsun-totals', 'daily-activity',
+    ]
+    argv = ['hamster-briefs', '-D', db_path, '-b', '2017-01-01', '-e', '2017-02-01']
+    for list_type in list_types:
+        argv += ['-r', list_type]
+    submitted = []
+    submit = report_jobs.Report_Pool.submit
+
+    def submit_spy(self, list_type):
+        submitted.append(list_type)
+        return submit(self, list_type)
+
+    monkeypatch.setattr(report_jobs.Report_Pool, 'submit', submit_spy)
+    outputs = []
+    for n_jobs in ('1', '2',):
+        monkeypatch.setattr(sys, 'argv', argv + ['--jobs', n_jobs])
+        hamster_briefs.Hamsterer().go()
+        outputs.append(capsys.readouterr().out)
+    # Only --jobs 2 used the pool, and it printed the reports in order.
+    assert submitted == list_types
+    assert outputs[1] == outputs[0]
+    headers = [x for x in outputs[1].split('\n') if x.endswith(']')]
+    assert [x.split('[')[-1][:-1] for x in headers] == list_types
+
+
+def test_name_filters_print_what_name_matching_printed(
+    tmpdir, monkeypatch, capsys, caplog,
+):
+    import logging
+    # What the reports printed when -a, -t, and -c matched names in the
+    # fact query (before they were resolved to IDs up front).
+    headers = [
+        '',
+        'GROSS TAG TOTALS [gross-tag]',
+        '============================',
+        'wkd|start_date|duration|tag_names',
+        '---|----------|--------|---------',
+    ]
+    daily_headers = [
+        '',
+        'DAILY CATEGORY TOTALS [daily-category]',
+        '======================================',
+    ]
+    name_filter_outputs = [
+        (['-a', 'Cook', '-t', 'beta'], headers + [
+            'sun|2017-01-01|   2.000|',
+            'sun|2017-01-01|   2.000|beta',
+        ] + daily_headers + [
+            'tue|2017-01-03|   1.250|        work',
+            'tue|2017-01-03|   1.500|        home',
+            'tue|2017-01-10|   0.750|        work',
+            'tue|2017-01-10|   0.167|        home',
+            'thu|2017-01-12|   0.333|        home',
+        ]),
+        (['-a', 'Cod', '-t', 'alpha', '--and'], headers + [
+            'sun|2017-01-01|   2.750|alpha',
+        ] + daily_headers + [
+            'mon|2017-01-02|   2.000|        work',
+            'tue|2017-01-10|   0.750|        work',
+        ]),
+        # Unknown names match nothing; they're not an error.
+        (['-a', 'Nosuch', '-t', 'alpha', '--and'], headers + daily_headers),
+        (['-a', 'Nosuch', '-t', 'nosuch', '-c', 'nosuch'], headers + daily_headers),
+    ]
+    db_path = make_report_db(tmpdir)
+    argv = ['-D', db_path] + REPORT_ARGS + ['-r', 'gross-tag', '-r', 'daily-category']
+    for (name_filters, outlns) in name_filter_outputs:
+        output = run_briefs(monkeypatch, capsys, argv + name_filters)
+        assert output == '\n'.join(outlns + [''])
+    assert not [x for x in caplog.records if x.levelno >= logging.WARNING]
+
+
+def test_category_pushdown_prints_what_the_outer_filter_printed(
+    tmpdir, monkeypatch, capsys,
+):
+    from hamster_briefs.hamster_briefs import Hamsterer
+    db_path = make_report_db(tmpdir)
+    argvs = [
+        ['-D', db_path] + REPORT_ARGS + ['-r', 'gross', '-r', 'daily', '-r', 'weekly'] + cats
+        for cats in (['-c', 'home'], ['-c', 'work', '-T'], ['-c', 'home', '-c', 'work'])
+    ]
+    pushed_outputs = [run_briefs(monkeypatch, capsys, argv) for argv in argvs]
+    # The newer work fact that starts at 08:00 on the 12th hides the
+    # home fact that starts then, too, with or without the pushdown.
+    assert 'thu|2017-01-12' not in pushed_outputs[0]
+    assert 'thu|2017-01-12|   1.000' in pushed_outputs[1]
+
+    def setup_no_category_start_times(self):
+        self.str_params['SQL_CATEGORY_START_TIMES'] = ''
+
+    monkeypatch.setattr(
+        Hamsterer, 'setup_sql_category_start_times', setup_no_category_start_times,
+    )
+    assert [run_briefs(monkeypatch, capsys, argv) for argv in argvs] == pushed_outputs
+
+
+def test_calendar_counts_julianweeks_from_fixed_epochs():
+    from hamster_briefs.hamster_briefs import Hamsterer
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE facts (id INTEGER PRIMARY KEY, start_time TIMESTAMP);
+        INSERT INTO facts VALUES (1, '2017-03-15 09:00:00');
+    """)
+    # Sprints start on Saturdays (-w sat); 2017-01-01 was a Sunday.
+    for sql_stmt in Hamsterer.sql_calendar_stmts(6):
+        conn.execute(sql_stmt)
+    calendar_sql = (
+        "SELECT day, yrjul, day_name, week_start, satsun_week, sprint_week, month"
+        " FROM temp.calendar WHERE day IN (?, ?, ?, ?) ORDER BY day"
+    )
+    days = ('2017-01-01', '2017-01-07', '2017-01-08', '2017-03-15',)
+    rows = conn.execute(calendar_sql, days).fetchall()
+    assert rows == [
+        ('2017-01-01', '2017-001', 'sun', '2016-12-31', 2088, 1044, '2017-01'),
+        ('2017-01-07', '2017-007', 'sat', '2017-01-07', 2088, 1045, '2017-01'),
+        ('2017-01-08', '2017-008', 'sun', '2017-01-07', 2089, 1045, '2017-01'),
+        ('2017-03-15', '2017-074', 'wed', '2017-03-11', 2098, 1054, '2017-03'),
+    ]
+    # The julianweeks the reports always used (see git history), at noon.
+    julianweeks = conn.execute("""
+        SELECT
+            CAST((julianday(day, '+12 hours') - julianday('1977-01-01') + 6) / 7 AS integer)
+            , CAST((
+                julianday(day, '+12 hours') - pseudo_week_offset + 7
+                - julianday('1997-01-01')
+            ) / 7 AS integer)
+        FROM temp.calendar
+    """).fetchall()
+    assert julianweeks == conn.execute(
+        "SELECT satsun_week, sprint_week FROM temp.calendar"
+    ).fetchall()
+    # A backdated fact grows the calendar, but renumbers no weeks.
+    conn.execute("INSERT INTO facts VALUES (2, '1996-12-20 09:00:00')")
+    for sql_stmt in Hamsterer.sql_calendar_stmts(6):
+        conn.execute(sql_stmt)
+    assert conn.execute(calendar_sql, days).fetchall() == rows
+    (first_day, last_day) = conn.execute(
+        "SELECT min(day), max(day) FROM temp.calendar"
+    ).fetchone()
+    assert first_day == '1996-01-01'
+    assert last_day >= '2017-03-15'
+    # Before 1997, sprint weeks count down from 0 (Sat, 1996-12-28 on).
+    assert conn.execute(
+        "SELECT day, sprint_week FROM temp.calendar"
+        " WHERE day BETWEEN '1996-12-20' AND '1997-01-04' AND day_name = 'sat'"
+    ).fetchall() == [
+        ('1996-12-21', -1), ('1996-12-28', 0), ('1997-01-04', 1),
+    ]
+
+
+def test_brief_engine_rolls_up_coarse_reports_from_finer_ones():
+    list_types = ['daily-activity', 'sprint-tag', 'sprint-totals', 'gross-category']
+    fact_rows = [
+        # (yrjul, start_jd, pseudo_week_offset, satsun_week, sprint_week,
+        #  duration, category_name, activity_name, activity_id, tag_names)
+        ('2017-001', 2457755.0, 1.0, 0, 0, 5400, 'work', 'Code', 1, 'alpha'),
+        ('2017-001', 2457755.1, 1.0, 0, 0, 1800, 'home', 'Code', 2, None),
+        ('2017-002', 2457756.0, 2.0, 1, 0, 7200, 'work', 'Code', 1, 'beta'),
+        ('2017-009', 2457763.0, 2.0, 2, 1, 3600, 'work', 'Meet', 3, 'alpha'),
+    ]
+    engine = brief_engine.Brief_Engine(list_types, show_cats=True)
+    # One pass into the finest grain, which the requested reports refine.
+    assert engine.root.grain == ('day', False, 'id', True)
+    assert engine.root.list_type not in engine.reports
+    engine.add_facts(fact_rows)
+    for list_type in list_types:
+        # The same as computing the report from the facts.
+        direct = brief_engine.Brief_Engine([list_type], show_cats=True)
+        assert direct.root is direct.reports[list_type]
+        direct.add_facts(fact_rows)
+        assert engine.output_lines(list_type) == direct.output_lines(list_type)
+
+
+def test_union_engine_runs_weekly_and_gross_reports_together():
+    import types
+    from hamster_briefs.hamster_briefs import Hamsterer
+    hr = Hamsterer.__new__(Hamsterer)
+    hr.cli_opts = types.SimpleNamespace(do_list_types=[
+        'daily-tag', 'satsun-tag', 'satsun-totals', 'gross-tag', 'gross-totals',
+        'egg', 'sprint-category', 'daily-totals', 'sprint-tag', 'sprint-totals',
+    ])
+    hr.union_reports = True
+    assert list(hr.union_list_types()) == [
+        ['daily-tag'],
+        ['satsun-tag', 'satsun-totals'],
+        ['gross-tag', 'gross-totals'],
+        ['egg'],
+        ['sprint-category'],
+        ['daily-totals'],
+        ['sprint-tag', 'sprint-totals'],
+    ]
+    hr.union_reports = False
+    assert len(list(hr.union_list_types())) == len(hr.cli_opts.do_list_types)
+
+
+def test_union_engine_prints_what_each_report_prints(tmpdir, monkeypatch, capsys, caplog):
+    import logging
+    from hamster_briefs.hamster_briefs import Hamsterer
+    db_path = make_report_db(tmpdir)
+    # And some facts this week, for -0 and -1.
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        INSERT INTO facts (id, activity_id, start_time, end_time, deleted) VALUES
+            (9, 1, date('now', 'localtime') || ' 00:00:00',
+                date('now', 'localtime') || ' 00:30:00', 0),
+            (10, 2, date('now', 'localtime', '-1 day') || ' 12:00:00',
+                date('now', 'localtime', '-1 day') || ' 13:15:00', 0);
+        INSERT INTO fact_tags VALUES (9, 2);
+    """)
+    conn.commit()
+    conn.close()
+    union_runs = []
+    list_union_reports = Hamsterer.list_union_reports
+
+    def list_union_reports_spy(self, list_types):
+        union_runs.append(list_types)
+        list_union_reports(self, list_types)
+
+    monkeypatch.setattr(Hamsterer, 'list_union_reports', list_union_reports_spy)
+    for report_args in (
+        ['-0', '-r', 'gross'],
+        ['-1', '-r', 'gross', '-r', 'weekly', '-r', 'daily-tag', '-T', '-C'],
+        REPORT_ARGS + ['-r', 'sprint-summary', '-w', 'wed', '-T'],
+    ):
+        argv = ['-D', db_path] + report_args
+        outputs = [
+            run_briefs(monkeypatch, capsys, argv + ['--engine', engine])
+            for engine in ('sql', 'union',)
+        ]
+        assert union_runs
+        del union_runs[:]
+        assert '|' in outputs[0]
+        assert outputs[1] == outputs[0]
+    assert not [x for x in caplog.records if x.levelno >= logging.WARNING]
+
+    # If the union query fails partway, the rest of the reports run one
+    # by one, under their own headers.
+    output_reassemble = Hamsterer.output_reassemble_split_line_comments
+    n_reassembles = []
+
+    def output_reassemble_failing(self, outlns):
+        n_reassembles.append(outlns)
+        if len(n_reassembles) == 2:
+            raise sqlite3.OperationalError('interrupted')
+        return output_reassemble(self, outlns)
+
+    monkeypatch.setattr(
+        Hamsterer, 'output_reassemble_split_line_comments', output_reassemble_failing,
+    )
+    argv = ['-D', db_path] + REPORT_ARGS + ['-r', 'gross']
+    union_output = run_briefs(monkeypatch, capsys, argv + ['--engine', 'union'])
+    assert union_output == run_briefs(monkeypatch, capsys, argv + ['--engine', 'sql'])
+    assert union_runs == [[
+        'gross-tag', 'gross-activity', 'gross-activity-tag', 'gross-category', 'gross-totals',
+    ]]
+    assert [x.getMessage() for x in caplog.records if x.levelno >= logging.WARNING] == [
+        'Union query failed: interrupted; running the reports one by one.',
+    ]
+
+
+def test_sqlite3_modes_round_half_way_durations_alike(tmpdir, monkeypatch, capsys):
+    import shutil
+    import sys
+    import pytest
+    from hamster_briefs import hamster_briefs
+    if shutil.which('sqlite3') is None:
+        pytest.skip('No sqlite3 binary')
+    db_path = str(tmpdir.join('hamster.db'))
+    # 27 and 81 seconds are 0.0075 and 0.0225 hours.
+    make_hamster_db(db_path, [
+        (1, 1, '2017-01-02 08:00:00', '2017-01-02 08:00:27', 0),
+        (2, 2, '2017-01-03 08:00:00', '2017-01-03 08:01:21', 0),
+    ])
+    outputs = []
+    for sqlite3_mode in ('internal', 'coprocess', 'subprocess',):
+        monkeypatch.setattr(sys, 'argv', [
+            'hamster-briefs', '-D', db_path, '-b', '2017-01-01', '-e', '2017-02-01',
+            '--sqlite3', sqlite3_mode, '-A', '-r', 'daily-totals', '-r', 'gross-activity',
+        ])
+        hamster_briefs.Hamsterer().go()
+        outputs.append(capsys.readouterr().out)
+    assert '|   0.008' in outputs[0]
+    assert '|   0.023' in outputs[0]
+    assert outputs[1] == outputs[0]
+    assert outputs[2] == outputs[0]